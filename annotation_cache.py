@@ -0,0 +1,221 @@
+import json
+import os
+from collections import OrderedDict
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def load_json(path):
+    """Parse a JSON file, with orjson when it is installed"""
+    if orjson is not None:
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def load_feature_collection(path):
+    """FeatureCollection dict from GeoJSON, or from the FlatGeobuf / GeoParquet outputs through geopandas"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.fgb', '.parquet'):
+        return load_json(path)
+    import geopandas as gpd
+    gdf = gpd.read_parquet(path) if extension == '.parquet' else gpd.read_file(path)
+    return {"type": "FeatureCollection", "features": list(gdf.iterfeatures(na='null'))}
+
+
+def pack_rings(rings):
+    """Concatenate rings into one (N, 2) vertex array plus the offsets of each ring"""
+    offsets = np.zeros(len(rings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(ring) for ring in rings])
+    vertices = np.array([point[:2] for ring in rings for point in ring], dtype=float).reshape(-1, 2)
+    return vertices, offsets
+
+
+class ParsedFeatures:
+    """
+    All shapes of one LabelMe / GeoJSON file as a single (N, 2) vertex array.
+    Shape i owns vertices[offsets[i]:offsets[i + 1]]; for polygons only the exterior ring is kept.
+    """
+    def __init__(self, vertices, offsets, labels=None, properties=None, geometry_types=None):
+        self.vertices = vertices
+        self.offsets = offsets
+        self.labels = labels  # LabelMe shape labels
+        self.properties = properties  # GeoJSON feature properties
+        self.geometry_types = geometry_types
+
+    @classmethod
+    def from_features(cls, features):
+        """Pack GeoJSON feature dicts; only the exterior ring of polygons is kept"""
+        rings, properties, geometry_types = [], [], []
+        for feature in features:
+            geometry = feature['geometry']
+            if geometry['type'] == 'Polygon':
+                rings.append(geometry['coordinates'][0])
+            elif geometry['type'] == 'Point':
+                rings.append([geometry['coordinates']])
+            else:
+                rings.append(geometry['coordinates'])
+            geometry_types.append(geometry['type'])
+            properties.append(feature.get('properties') or {})
+        vertices, offsets = pack_rings(rings)
+        return cls(vertices, offsets, properties=properties, geometry_types=geometry_types)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def coords(self, i):
+        return self.vertices[self.offsets[i]:self.offsets[i + 1]]
+
+    def centroids(self):
+        """
+        Area centroids of all rings at once (shoelace, taken relative to each ring's first
+        vertex like GEOS does). Rings without area fall back to the mean of their vertices.
+        """
+        n = len(self)
+        counts = np.diff(self.offsets)
+        if n == 0 or len(self.vertices) == 0:
+            return np.full((n, 2), np.nan)
+
+        owner = np.repeat(np.arange(n), counts)
+        starts = np.minimum(self.offsets[:-1], len(self.vertices) - 1)
+        base = self.vertices[starts]
+        p = self.vertices - base[owner]
+
+        following = np.arange(1, len(self.vertices) + 1)
+        filled = counts > 0
+        following[self.offsets[1:][filled] - 1] = self.offsets[:-1][filled]
+        q = p[following]
+
+        cross = p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1]
+        area2 = np.bincount(owner, weights=cross, minlength=n)
+        cx = np.bincount(owner, weights=cross * (p[:, 0] + q[:, 0]), minlength=n)
+        cy = np.bincount(owner, weights=cross * (p[:, 1] + q[:, 1]), minlength=n)
+        mean_x = np.bincount(owner, weights=p[:, 0], minlength=n)
+        mean_y = np.bincount(owner, weights=p[:, 1], minlength=n)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            centroids = np.column_stack([cx / (3 * area2), cy / (3 * area2)])
+            means = np.column_stack([mean_x / counts, mean_y / counts])
+        flat = area2 == 0
+        centroids[flat] = means[flat]
+        return centroids + base
+
+    def values(self, name, default=None):
+        """One property of every feature as a float array, with missing values as NaN"""
+        values = [properties.get(name, default) for properties in self.properties]
+        return np.array([np.nan if value is None else value for value in values], dtype=float)
+
+    def to_features(self):
+        """GeoJSON feature dicts, generated one at a time for the streaming writers"""
+        for i, kind in enumerate(self.geometry_types):
+            coords = self.coords(i).tolist()
+            if kind == 'Polygon':
+                coords = [coords]
+            elif kind == 'Point':
+                coords = coords[0]
+            yield {"type": "Feature", "geometry": {"type": kind, "coordinates": coords}, "properties": self.properties[i]}
+
+    def to_geodataframe(self, crs="EPSG:4326"):
+        """GeoDataFrame of the parsed GeoJSON features, without reading the file again"""
+        import geopandas as gpd
+        from shapely.geometry import LineString, Point, Polygon
+
+        builders = {'Polygon': Polygon, 'LineString': LineString, 'Point': lambda c: Point(c[0])}
+        geometries = [builders[kind](self.coords(i)) for i, kind in enumerate(self.geometry_types)]
+        return gpd.GeoDataFrame(list(self.properties), geometry=geometries, crs=crs)
+
+
+class AnnotationCache:
+    """
+    Parsed annotation files keyed by path + mtime + size, so every stage of a plot
+    shares one parse. With persist=True a .npz sidecar lets reruns skip JSON parsing.
+    """
+    def __init__(self, max_entries=64, persist=False):
+        self.max_entries = max_entries
+        self.persist = persist
+        self._entries = OrderedDict()
+
+    def file_key(self, path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_mtime_ns, stat.st_size
+
+    def labelme(self, json_path):
+        return self._get(json_path, 'labelme', self._parse_labelme)
+
+    def geojson(self, geojson_path):
+        """Features of a GeoJSON file, or of a FlatGeobuf / GeoParquet output"""
+        return self._get(geojson_path, 'geojson', self._parse_geojson, load_feature_collection)
+
+    def _get(self, path, kind, parser, loader=load_json):
+        key = self.file_key(path) + (kind,)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+        parsed = self._load_sidecar(path, key) if self.persist else None
+        if parsed is None:
+            parsed = parser(loader(path))
+            if self.persist:
+                self._save_sidecar(path, key, parsed)
+
+        self._entries[key] = parsed
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return parsed
+
+    def _parse_labelme(self, data):
+        labels, rings = [], []
+        for shape in data.get("shapes", []):
+            labels.append(shape.get("label", ""))
+            rings.append(shape.get("points", []))
+        vertices, offsets = pack_rings(rings)
+        return ParsedFeatures(vertices, offsets, labels=labels)
+
+    def _parse_geojson(self, data):
+        return ParsedFeatures.from_features(data['features'])
+
+    def sidecar_path(self, path):
+        return path + '.cache.npz'
+
+    def _save_sidecar(self, path, key, parsed):
+        np.savez(
+            self.sidecar_path(path),
+            stamp=np.array(key[1:3], dtype=np.int64),
+            kind=np.array(key[3]),
+            vertices=parsed.vertices,
+            offsets=parsed.offsets,
+            labels=np.array(parsed.labels if parsed.labels is not None else [], dtype=str),
+            properties=np.array(json.dumps(parsed.properties)),
+            geometry_types=np.array(parsed.geometry_types or [], dtype=str),
+        )
+
+    def _load_sidecar(self, path, key):
+        sidecar = self.sidecar_path(path)
+        if not os.path.exists(sidecar):
+            return None
+        with np.load(sidecar) as npz:
+            if tuple(npz['stamp'].tolist()) != key[1:3] or str(npz['kind']) != key[3]:
+                return None
+            return ParsedFeatures(
+                npz['vertices'],
+                npz['offsets'],
+                labels=[str(label) for label in npz['labels']] if key[3] == 'labelme' else None,
+                properties=json.loads(str(npz['properties'])),
+                geometry_types=[str(kind) for kind in npz['geometry_types']] or None,
+            )
+
+
+def as_features(source):
+    """ParsedFeatures handed over in memory, or the parsed contents of a file path"""
+    if isinstance(source, ParsedFeatures):
+        return source
+    return ANNOTATIONS.geojson(source)
+
+
+# one cache per worker process, shared by every stage
+ANNOTATIONS = AnnotationCache()
@@ -0,0 +1,142 @@
+"""
+Metric distances between nearby WGS84 points, computed for whole arrays of pairs.
+
+The default mode evaluates each pair on the plane tangent to the WGS84 ellipsoid at the pair's
+mid-latitude (meridian and prime-vertical radii of curvature at that latitude). Its first-order
+error terms cancel; against Geod.inv (benchmark_accuracy) the deviation stays below 1e-8 m for the
+pairs of up to 3 m the pipeline measures, at any longitude and |lat| <= 80 degrees, and below
+1e-5 m (relative 1e-8) for pairs up to 1 km at |lat| <= 60 degrees. At 3 m this is the rounding of
+the degree differences, not the model. exact=True uses pyproj.Geod.inv (Karney's algorithm, as
+geopy.distance.geodesic does) on all pairs in one batched call.
+"""
+import time
+import numpy as np
+from pyproj import Geod
+
+WGS84_A = 6378137.0
+WGS84_E2 = 0.00669437999014
+WGS84_GEOD = Geod(ellps='WGS84')
+
+
+def radii_of_curvature(lat_radians):
+    """Meridian and prime-vertical radii of curvature (metres) at the given latitudes"""
+    w = np.sqrt(1 - WGS84_E2 * np.sin(lat_radians) ** 2)
+    return WGS84_A * (1 - WGS84_E2) / w ** 3, WGS84_A / w
+
+
+def project_local(lonlat, origin=None):
+    """
+    Project (lon, lat) degrees to metres on the plane tangent at `origin` (default: the centre
+    of the points). Used once per plot for spatial indexing; pair distances use local_distances.
+    """
+    lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+    if origin is None:
+        origin = (lonlat.min(0) + lonlat.max(0)) / 2 if len(lonlat) else np.zeros(2)
+    lat0 = np.radians(origin[1])
+    meridian, prime_vertical = radii_of_curvature(lat0)
+    x = np.radians(lonlat[:, 0] - origin[0]) * prime_vertical * np.cos(lat0)
+    y = np.radians(lonlat[:, 1] - origin[1]) * meridian
+    return np.column_stack([x, y])
+
+
+def local_distances(lonlat1, lonlat2):
+    """Distances in metres between matching rows of two (N, 2) lon/lat arrays, tangent plane at each mid-latitude"""
+    lonlat1 = np.asarray(lonlat1, dtype=float).reshape(-1, 2)
+    lonlat2 = np.asarray(lonlat2, dtype=float).reshape(-1, 2)
+    mid_lat = np.radians((lonlat1[:, 1] + lonlat2[:, 1]) / 2)
+    meridian, prime_vertical = radii_of_curvature(mid_lat)
+    d_lon = lonlat2[:, 0] - lonlat1[:, 0]
+    # pairs across the antimeridian; values elsewhere are left untouched
+    d_lon = np.radians(np.where(np.abs(d_lon) > 180, d_lon - np.copysign(360, d_lon), d_lon))
+    d_lat = np.radians(lonlat2[:, 1] - lonlat1[:, 1])
+    return np.hypot(d_lon * prime_vertical * np.cos(mid_lat), d_lat * meridian)
+
+
+def geodesic_distances(lonlat1, lonlat2):
+    """Ellipsoidal geodesic distances in metres, batched through pyproj.Geod.inv"""
+    lonlat1 = np.asarray(lonlat1, dtype=float).reshape(-1, 2)
+    lonlat2 = np.asarray(lonlat2, dtype=float).reshape(-1, 2)
+    if len(lonlat1) == 0:
+        return np.zeros(0)
+    _, _, d = WGS84_GEOD.inv(lonlat1[:, 0], lonlat1[:, 1], lonlat2[:, 0], lonlat2[:, 1])
+    return np.asarray(d, dtype=float)
+
+
+def pair_distances(lonlat, i, j, exact=False):
+    """Distances in metres between points i[k] and j[k] of one plot's (N, 2) lon/lat array"""
+    lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+    if exact:
+        return geodesic_distances(lonlat[i], lonlat[j])
+    return local_distances(lonlat[i], lonlat[j])
+
+
+def benchmark_distances(sizes=(1000, 10000, 100000), radius=3, spacing=1.5, geopy_sample=2000, seed=0):
+    """
+    Time geopy (per pair, on a sample) against the batched modes on candidate pairs of synthetic
+    plots with roughly `spacing` metres between trees, and report the worst deviation from geopy
+    """
+    from geopy.distance import geodesic
+    from spatial_index import neighbor_pairs
+
+    rng = np.random.default_rng(seed)
+    results = {}
+    for n in sizes:
+        side = np.sqrt(n) * spacing
+        xy = rng.uniform(0, side, size=(n, 2))
+        lonlat = np.column_stack([-1.5 + xy[:, 0] / 111320 / np.cos(np.radians(-35)), -35 + xy[:, 1] / 110950])
+        i, j = neighbor_pairs(lonlat, radius)
+
+        start = time.perf_counter()
+        approx = pair_distances(lonlat, i, j)
+        local_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exact = pair_distances(lonlat, i, j, exact=True)
+        geod_time = time.perf_counter() - start
+
+        sample = slice(0, min(geopy_sample, len(i)))
+        start = time.perf_counter()
+        reference = np.array([geodesic((lonlat[a, 1], lonlat[a, 0]), (lonlat[b, 1], lonlat[b, 0])).meters
+                              for a, b in zip(i[sample], j[sample])])
+        geopy_time = (time.perf_counter() - start) / max(len(reference), 1) * len(i)
+
+        results[n] = {
+            'pairs': len(i),
+            'geopy_s_estimated': geopy_time,
+            'geod_batched_s': geod_time,
+            'local_plane_s': local_time,
+            'local_max_abs_error_m': float(np.max(np.abs(approx[sample] - reference))) if len(reference) else 0.0,
+            'geod_max_abs_error_m': float(np.max(np.abs(exact[sample] - reference))) if len(reference) else 0.0,
+        }
+    return results
+
+
+def benchmark_accuracy(max_distances=(3, 1000), max_latitudes=(60, 80), n=200000, seed=0):
+    """
+    Worst absolute (m) and relative deviation of the tangent-plane distances from Geod.inv on
+    random pairs anywhere in longitude, up to max_distance apart and within |lat| <= max_latitude
+    """
+    rng = np.random.default_rng(seed)
+    results = {}
+    for max_distance in max_distances:
+        for max_latitude in max_latitudes:
+            lon = rng.uniform(-180, 180, n)
+            lat = rng.uniform(-max_latitude, max_latitude, n)
+            distance = rng.uniform(0.1, max_distance, n)
+            lon2, lat2, _ = WGS84_GEOD.fwd(lon, lat, rng.uniform(0, 360, n), distance)
+            lonlat = np.vstack([np.column_stack([lon, lat]), np.column_stack([lon2, lat2])])
+            i, j = np.arange(n), np.arange(n, 2 * n)
+            exact = pair_distances(lonlat, i, j, exact=True)
+            error = np.abs(pair_distances(lonlat, i, j) - exact)
+            results[(max_distance, max_latitude)] = {
+                'max_abs_error_m': float(error.max()),
+                'max_rel_error': float((error / exact).max()),
+            }
+    return results
+
+
+if __name__ == "__main__":
+    for n, stats in benchmark_distances().items():
+        print(n, stats)
+    for (max_distance, max_latitude), stats in benchmark_accuracy().items():
+        print(f"<= {max_distance} m, |lat| <= {max_latitude}", stats)
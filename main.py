@@ -2,23 +2,46 @@ import os
 from utils_plant import *
 from well_space import *
 from overall_utils import * 
+from vector_output import output_name
+from plot_result import PlotResult
+from spatial_index import NeighborIndex
+from raster_handle import RasterHandle
 import shutil
 import warnings
 from tqdm import tqdm
 from multiprocessing import Pool, cpu_count
 warnings.filterwarnings('ignore')
 
+# (plot, stratum) -> flight metadata, set once per worker by init_worker
+_PLOT_METADATA = None
+
+def init_worker(plot_metadata):
+    global _PLOT_METADATA
+    _PLOT_METADATA = plot_metadata
+
 class Tree_all:
-    def __init__(self, input_path, dem_folder, csv_path, reference_dict):
+    def __init__(self, input_path, dem_folder, csv_path, reference_dict, output_format='geojson',
+                 well_space_thresholds=None, renderer='matplotlib', preview_format=None,
+                 full_resolution_viz=False, cog=False, solver='greedy', objective='count',
+                 exact_time_budget=1.0, exact_distance=False, windowed=False, native_resolution=False,
+                 native_dem=False):
         self.image_folder = input_path
         self.dem_folder = dem_folder
         self.reference_dict = reference_dict
         self.csv_path = csv_path
+        self.output_format = output_format  # 'geojson', 'flatgeobuf' or 'geoparquet'
+        self.well_space_thresholds = well_space_thresholds  # e.g. (1.0, 1.5, 2.0, 2.5) adds per-threshold columns
         
-        self.plantHealth_obj = UtilsHealth(reference_dict)
-        self.wellSpace_obj = TreeOptimizer()
-        self.overall_utils = TreeUtils()
-        self.plot_vector = TreeVectorViz()
+        # windowed reads only the tree windows; native_* keep imagery / DEM on their source grids
+        self.plantHealth_obj = UtilsHealth(reference_dict, windowed=windowed, native_resolution=native_resolution,
+                                           native_dem=native_dem, output_format=output_format)
+        # solver / objective per contract: 'greedy', 'heap' or 'exact'; 'count' or 'height' (heap / exact)
+        self.wellSpace_obj = TreeOptimizer(output_format=output_format, solver=solver, objective=objective,
+                                           exact_time_budget=exact_time_budget, exact_distance=exact_distance)
+        self.overall_utils = TreeUtils(output_format=output_format)
+        # 'opencv' draws on the image grid without matplotlib and keeps the GeoTIFF georeferenced
+        viz_class = TreeRasterViz if renderer == 'opencv' else TreeVectorViz
+        self.plot_vector = viz_class(full_resolution=full_resolution_viz, preview_format=preview_format, cog=cog)
         
         result_folder= self.folder_maker(os.path.join(os.path.dirname(input_path), 'Results'))
         
@@ -34,6 +57,22 @@ class Tree_all:
         os.makedirs(path, exist_ok=True)
         return path
     
+    def plot_metadata(self):
+        """The indexed metadata CSV; loaded here only when no pool initializer has provided it"""
+        global _PLOT_METADATA
+        if _PLOT_METADATA is None:
+            _PLOT_METADATA = self.overall_utils.load_plot_metadata(self.csv_path)
+        return _PLOT_METADATA
+
+    def missing_metadata(self, img_files, plot_metadata):
+        """Images whose (plot, stratum) has no metadata row, or that carry no plot/stratum in the name"""
+        missing = []
+        for img in img_files:
+            key = self.overall_utils.extract_plot_and_stratum(os.path.join(self.image_folder, img))
+            if key is None or (int(key[0]), key[1]) not in plot_metadata:
+                missing.append((img, key))
+        return missing
+
     def csv_maker(self, result, output_csv_path):
         df = pd.DataFrame(result)
         df.to_csv(output_csv_path, index=False)
@@ -50,29 +89,42 @@ class Tree_all:
         dem_name = "_".join(parts)
         dem_path = os.path.join(self.dem_folder, dem_name)
         json_path = os.path.join(self.image_folder, os.path.splitext(img)[0] + ".json")
-        health_geojson = os.path.join(self.health_folder, os.path.splitext(img)[0] + ".geojson")
-        wellSpace_geojson = os.path.join(self.wellspace_folder, os.path.splitext(img)[0] + ".geojson")
-        line_geojson = os.path.join(self.line_folder, os.path.splitext(img)[0] + ".geojson")
+        stem = os.path.splitext(img)[0]
+        health_geojson = os.path.join(self.health_folder, output_name(stem, self.output_format))
+        wellSpace_geojson = os.path.join(self.wellspace_folder, output_name(stem, self.output_format))
+        line_geojson = os.path.join(self.line_folder, output_name(stem, self.output_format))
         visualization_output = os.path.join(self.visulization_folder, img)
 
-        totalArea_conifer, avgHeight, small, medium, large = self.plantHealth_obj.tree_health_calculator(
-            img_path, dem_path, json_path, health_geojson)
-        totalImageArea = self.overall_utils.image_area(img_path)
-        wellspace_count, well_space_avg_height = self.wellSpace_obj.well_space_calculator(
-            health_geojson, wellSpace_geojson)
+        # stages hand their layers over in memory; the vector files are written once at the end
+        plot_result = PlotResult(stem)
+        # the orthomosaic is opened once and every stage reads through the same handle
+        with RasterHandle(img_path) as raster:
+            totalArea_conifer, avgHeight, small, medium, large = self.plantHealth_obj.tree_health_calculator(
+                raster, dem_path, json_path, result=plot_result)
+            totalImageArea = self.overall_utils.image_area(raster)
+            # neighbour discovery runs once per plot, wide enough for every stage that needs it
+            plot_result.neighbors = NeighborIndex(
+                plot_result.health,
+                max([self.wellSpace_obj.buffer_dist, 3] + list(self.well_space_thresholds or [])),
+                exact=self.wellSpace_obj.exact_distance
+            )
+            wellspace_count, well_space_avg_height = self.wellSpace_obj.well_space_calculator(
+                plot_result.health, result=plot_result, neighbors=plot_result.neighbors)
     
-        self.overall_utils.create_segment_connections(health_geojson, line_geojson)
-        self.plot_vector.plot_vector_visualization(
+            self.overall_utils.create_segment_connections(
+                plot_result.health, result=plot_result, neighbors=plot_result.neighbors)
+            viz_written = self.plot_vector.plot_vector_visualization(
             
-            img_path, line_geojson,  wellSpace_geojson,health_geojson,  visualization_output)
+                raster, plot_result.lines,  plot_result.wellspace, plot_result.health,  visualization_output)
+        plot_result.write(health_geojson, wellSpace_geojson, line_geojson, self.output_format)
         scout_area = self.overall_utils.scoout_area()
         total_confiffers = self.overall_utils.total_coniffer(json_path)
         plot_number, stratum = self.overall_utils.extract_plot_and_stratum(img_path)
-        csv_data = self.overall_utils.data_csv(self.csv_path, plot_number, stratum)
+        csv_data = self.plot_metadata()[(int(plot_number), stratum)]
         temp = f"silviculture/zanzibar/1627/{img}"
         s3_url = self.overall_utils.upload_to_s3(visualization_output, 'datastore-farmevo', temp)
 
-        return {
+        result = {
             "company": csv_data.get("location"),
             "block": csv_data.get("block"),
             "stratum": stratum,
@@ -84,23 +136,46 @@ class Tree_all:
             "avgTreeHeight_well_spaced": well_space_avg_height,
             "totalTrees": total_confiffers,
             "wellSpacedTrees": wellspace_count,
+            "wellSpace_solver": self.wellSpace_obj.solver_report['solver'],
+            "wellSpace_objective": self.wellSpace_obj.solver_report['objective'],
+            "wellSpace_objective_value": self.wellSpace_obj.solver_report['objective_value'],
             "height_lt_1.5": small,
             "height_gte_1.5_lt_2.5": medium,
             "height_gte_2.5": large,
             "slashArea": csv_data.get("slashArea"),
             "crown_closureArea": totalArea_conifer,
             "crown_closureArea_Percent": (totalArea_conifer / totalImageArea) * 100, 
-            "s3-URL": s3_url
+            "s3-URL": s3_url,
+            "viz_size_bytes": viz_written['size_bytes'],
+            "viz_write_seconds": viz_written['write_seconds'],
         }
 
+        if self.well_space_thresholds:
+            for row in self.wellSpace_obj.well_space_sweep(
+                    plot_result.health, self.well_space_thresholds, neighbors=plot_result.neighbors):
+                result[f"wellSpacedTrees_{row['threshold']}m"] = row['count']
+                result[f"avgTreeHeight_well_spaced_{row['threshold']}m"] = row['avg_height']
+        return result
+
     def processs_image(self):
         img_files = os.listdir(self.image_folder)
         total_files = len([f for f in img_files if any(f.lower().endswith(ext) 
                         for ext in ['.png', '.jpg', '.tiff', '.tif'])])
+
+        # the CSV is parsed once here and handed to each worker once, before any raster is opened
+        plot_metadata = self.overall_utils.load_plot_metadata(self.csv_path)
+        missing = self.missing_metadata(
+            [f for f in img_files if any(f.lower().endswith(ext) for ext in ['.png', '.jpg', '.tiff', '.tif'])],
+            plot_metadata
+        )
+        if missing:
+            for img, key in missing:
+                print(f"No metadata for {img} (plot, stratum = {key})")
+            raise ValueError(f"{len(missing)} images have no row in {self.csv_path}")
         
         print(f"Processing {total_files} images with {cpu_count()} CPU cores")
         
-        with Pool(processes=cpu_count()) as pool:
+        with Pool(processes=cpu_count(), initializer=init_worker, initargs=(plot_metadata,)) as pool:
             results = list(tqdm(
                 pool.imap(self.process_single_image, img_files),
                 total=len(img_files),
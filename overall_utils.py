@@ -1,19 +1,10 @@
-import json
 import rasterio
 import numpy as np
 import re
 import pandas as pd
-import geopandas as gpd
-import matplotlib.pyplot as plt
-import matplotlib.patheffects as path_effects
-from shapely.geometry import LineString, Point
 import math
-from shapely.geometry import Polygon, LineString, mapping
 from collections import defaultdict
-from rasterio.plot import show
-from geopy.distance import geodesic
 from pyproj import Transformer
-from matplotlib.patches import Circle
 import re,os
 import boto3
 from urllib.parse import urlparse
@@ -21,37 +12,36 @@ from boto3.s3.transfer import TransferConfig
 import shutil
 from botocore.exceptions import ClientError
 import logging
+import time
+import cv2
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+import rasterio.shutil
+from annotation_cache import ANNOTATIONS, as_features
+from plot_result import line_layer
+from vector_output import write_features
+from distance import pair_distances
+from spatial_index import NeighborIndex
+from raster_handle import RasterHandle, open_raster, pixel_size_metres
+from utils_plant import cached_transformer
 logger = logging.getLogger(__name__)
 
 class TreeUtils:
-    def __init__(self):
+    def __init__(self, output_format='geojson'):
+        self.output_format = output_format
         self.health_Colours = {'0': '#E3412B', '1': '#FBAA35', '2': '#30C876', '3': '#1E8C4D'}
         self.transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
 
     def total_coniffer(self, json_file):
-        with open(json_file, 'r') as file:
-            data = json.load(file)
-        return sum(1 for shape in data['shapes'] if shape.get('label') == '0')
+        shapes = ANNOTATIONS.labelme(json_file)
+        return sum(1 for label in shapes.labels if label == '0')
 
     def image_area(self, image):
-        with rasterio.open(image) as src:
-            # Get bounds in WGS84
-            bounds = src.bounds
-            # Calculate area using geodesic measurements
-            corners = [
-                (bounds.bottom, bounds.left),
-                (bounds.bottom, bounds.right),
-                (bounds.top, bounds.right),
-                (bounds.top, bounds.left)
-            ]
-            polygon = Polygon(corners)
-            return self.calculate_geographic_area(polygon)
-
-    def calculate_geographic_area(self, polygon):
-        """Calculate area of a polygon in square meters using geodesic measurements"""
-        geom = gpd.GeoSeries([polygon], crs="EPSG:4326")
-        geom_proj = geom.to_crs("EPSG:3857")
-        return geom_proj.area.iloc[0]
+        """Ground area of the raster footprint in square metres; image is a path or an open RasterHandle"""
+        if isinstance(image, RasterHandle):
+            return image.area
+        with RasterHandle(image) as raster:
+            return raster.area
 
     def scoout_area(self):
         return f"15* 15"
@@ -69,6 +59,20 @@ class TreeUtils:
         result = filtered_data[['location', 'block', 'slashArea', 'voidArea', 'flightDate', 'treeType']].iloc[0].to_dict()
         return result
 
+    def load_plot_metadata(self, csv_path):
+        """
+        Flight metadata indexed by (plot, stratum), read once. Like data_csv, the first row wins
+        when a key repeats; rows without a plot or stratum can never match and are skipped.
+        """
+        data = pd.read_csv(csv_path)
+        data = data.dropna(subset=['plot', 'stratum'])
+        data = data.drop_duplicates(subset=['plot', 'stratum'], keep='first')
+        columns = ['location', 'block', 'slashArea', 'voidArea', 'flightDate', 'treeType']
+        return {
+            (int(plot), str(stratum)): row
+            for plot, stratum, row in zip(data['plot'], data['stratum'], data[columns].to_dict('records'))
+        }
+
     def get_line_color(self, distance):
         if distance < 1:
             return 'red'
@@ -77,80 +81,33 @@ class TreeUtils:
         return 'green'
 
     def calculate_distance(self, point1, point2):
-        """Calculate distance between two points in meters using geodesic distance"""
-        return geodesic(
-            (point1.y, point1.x),  # Convert to (lat, lon) for geodesic
-            (point2.y, point2.x)
-        ).meters
+        """Calculate distance between two points in meters (see distance.py for the error bounds)"""
+        return float(pair_distances([(point1.x, point1.y), (point2.x, point2.y)], [0], [1])[0])
 
 
-    def create_segment_connections(self, input_geojson_path, output_geojson_path):
-        with open(input_geojson_path, 'r') as f:
-            data = json.load(f)
-        
-        segments = []
-        for i, feature in enumerate(data['features']):
-            polygon_coords = feature['geometry']['coordinates'][0]
-            polygon = Polygon(polygon_coords)
-            centroid = polygon.centroid
-            segments.append({
-                'id': i,
-                'centroid': Point(centroid.x, centroid.y)
-            })
-        
-        lines_features = []
-        processed_pairs = set()
-        
-        for i, seg1 in enumerate(segments):
-            for j, seg2 in enumerate(segments):
-                if i >= j:
-                    continue
-                    
-                pair_id = tuple(sorted([i, j]))
-                if pair_id in processed_pairs:
-                    continue
-                
-                processed_pairs.add(pair_id)
-                
-                # Calculate geodesic distance in meters
-                distance = self.calculate_distance(seg1['centroid'], seg2['centroid'])
-                
-                if distance <= 3:  
-                    line = LineString([
-                        (seg1['centroid'].x, seg1['centroid'].y),
-                        (seg2['centroid'].x, seg2['centroid'].y)
-                    ])
-                    
-                    if distance < 1:
-                        line_class = '2'
-                    elif distance <= 2:
-                        line_class = '1'
-                    else:
-                        line_class = '0'
-                    
-                    feature = {
-                        "type": "Feature",
-                        "geometry": mapping(line),
-                        "properties": {
-                            "class": line_class,
-                            "distance": round(distance, 3),
-                        }
-                    }
-                    lines_features.append(feature)
-        
-        output_geojson = {
-            "type": "FeatureCollection",
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": "urn:ogc:def:crs:EPSG::4326"
-                }
-            },
-            "features": lines_features
-        }
-        
-        with open(output_geojson_path, 'w') as f:
-            json.dump(output_geojson, f, indent=2)
+    def create_segment_connections(self, input_geojson_path, output_geojson_path=None, result=None, neighbors=None):
+        """
+        Lines between crowns closer than 3 m. The health layer may be a path or in-memory ParsedFeatures;
+        the lines are written to output_geojson_path and/or handed to result.lines (a PlotResult).
+        A NeighborIndex built from the same layer can be passed to skip neighbour discovery.
+        """
+        if neighbors is None:
+            neighbors = NeighborIndex(as_features(input_geojson_path), 3)
+        centroids = neighbors.centroids
+        first, second, distances = neighbors.pairs_within(3)
+
+        line_classes = np.select([distances < 1, distances <= 2], ['2', '1'], '0')
+        starts, ends = centroids[first], centroids[second]
+        lines_properties = [
+            {"class": line_class, "distance": round(distance, 3)}
+            for line_class, distance in zip(line_classes.tolist(), distances.tolist())
+        ]
+
+        lines = line_layer(starts, ends, lines_properties)
+        if result is not None:
+            result.lines = lines
+        if output_geojson_path is not None:
+            write_features(lines.to_features(), output_geojson_path, self.output_format)
     
     def upload_to_s3(lself, local_file_path, bucket_name, folder_key):
         s3 = boto3.client('s3')
@@ -183,10 +140,59 @@ class TreeUtils:
     
             
             
+PREVIEW_FORMATS = {'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY), 'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY)}
+
+
+def fit_shape(height, width, max_size):
+    """(height, width) scaled down so the longer side is at most max_size; never scaled up"""
+    scale = min(1.0, max_size / max(height, width, 1))
+    return max(int(round(height * scale)), 1), max(int(round(width * scale)), 1)
+
+
+def write_preview(rgb, output_path, preview_format='jpeg', size=512, quality=85):
+    """Small JPEG / WebP next to output_path (<name>_preview.jpg / .webp) for dashboards; returns its path"""
+    extension, quality_flag = PREVIEW_FORMATS[preview_format]
+    height, width = fit_shape(rgb.shape[0], rgb.shape[1], size)
+    small = cv2.resize(rgb, (width, height), interpolation=cv2.INTER_AREA)
+    # the suffix keeps a .jpg visualization from being overwritten by its own preview
+    preview_path = os.path.splitext(output_path)[0] + '_preview' + extension
+    cv2.imwrite(preview_path, cv2.cvtColor(small, cv2.COLOR_RGB2BGR), [quality_flag, quality])
+    return preview_path
+
+
+def write_rgb(rgb, output_path, profile, cog=False, compress='DEFLATE'):
+    """
+    Write an (H, W, 3) uint8 array as a GeoTIFF: plain, or as a Cloud-Optimized GeoTIFF (tiled,
+    compressed, with internal overviews, built on all cores). Returns the file size and write time.
+    """
+    start = time.perf_counter()
+    profile = dict(profile, count=3, dtype='uint8', width=rgb.shape[1], height=rgb.shape[0])
+    bands = np.transpose(rgb, (2, 0, 1))
+    if not cog:
+        with rasterio.open(output_path, 'w', **dict(profile, driver='GTiff')) as dst:
+            dst.write(bands)
+    else:
+        options = {'COMPRESS': compress, 'BLOCKSIZE': 512, 'OVERVIEWS': 'AUTO', 'NUM_THREADS': 'ALL_CPUS'}
+        if compress in ('DEFLATE', 'LZW', 'ZSTD'):
+            options['PREDICTOR'] = 2
+        # the COG driver can only copy an existing dataset, so stage the array in memory first
+        with MemoryFile() as memory:
+            with memory.open(**dict(profile, driver='GTiff')) as staged:
+                staged.write(bands)
+                rasterio.shutil.copy(staged, output_path, driver='COG', **options)
+    return {'size_bytes': os.path.getsize(output_path), 'write_seconds': time.perf_counter() - start}
+
+
 class TreeVectorViz:
-    def __init__(self):
+    def __init__(self, full_resolution=False, preview_format=None, preview_size=512, cog=False, compress='DEFLATE'):
         self.health_colors = {'0': '#E3412B', '1': '#FBAA35', '2': '#30C876', '3': '#1E8C4D'}
         self.line_colors = {'0': '#3EBCA1', '1': '#D9D9D9', '2': '#FD3E3E'}
+        self.figure_size, self.dpi = 8, 200  # inches, so the canvas is 1600 px wide
+        self.full_resolution = full_resolution  # read the whole orthomosaic instead of the canvas resolution
+        self.preview_format = preview_format  # None, 'jpeg' or 'webp'
+        self.preview_size = preview_size
+        self.cog = cog  # write a Cloud-Optimized GeoTIFF instead of a plain striped one
+        self.compress = compress  # COG compression: 'DEFLATE', 'ZSTD', 'JPEG', 'WEBP', ...
 
     def get_point_color(self, height):
         if height <= 1.5:
@@ -202,21 +208,32 @@ class TreeVectorViz:
 
     def plot_vector_visualization(self, image_path, lines_geojson_path, wellspace_geojson_path, 
                                 segments_geojson_path, output_path):
-        lines_gdf = gpd.read_file(lines_geojson_path)
-        wellspace_gdf = gpd.read_file(wellspace_geojson_path)
-        segments_gdf = gpd.read_file(segments_geojson_path)
+        # matplotlib is only imported by this renderer; TreeRasterViz does without it
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import EllipseCollection, LineCollection, PolyCollection
+        from rasterio.plot import show
 
-        with rasterio.open(image_path) as src:
+        # each layer is either a file path or in-memory ParsedFeatures from a PlotResult
+        lines_gdf = as_features(lines_geojson_path).to_geodataframe()
+        wellspace_gdf = as_features(wellspace_geojson_path).to_geodataframe()
+        segments_gdf = as_features(segments_geojson_path).to_geodataframe()
+
+        with open_raster(image_path) as src:
             image_crs = src.crs
             if image_crs is None:
                 raise ValueError("Image CRS not found. Please ensure the image has a valid CRS.")
-            image = src.read()
+            if self.full_resolution:
+                image = src.read()
+            else:
+                # the canvas cannot show more pixels than it has; GDAL serves this from overviews when present
+                image = src.read(out_shape=(src.count,) + fit_shape(src.height, src.width, self.figure_size * self.dpi),
+                                 resampling=Resampling.average)
             bounds = src.bounds
             transform = src.transform
             meta = src.meta.copy()
 
-        plt.rcParams['figure.dpi'] = 200
-        fig, ax = plt.subplots(figsize=(8, 8))
+        plt.rcParams['figure.dpi'] = self.dpi
+        fig, ax = plt.subplots(figsize=(self.figure_size, self.figure_size))
 
         extent = [bounds.left, bounds.right, bounds.bottom, bounds.top]
         show(image, ax=ax, extent=extent)
@@ -227,105 +244,88 @@ class TreeVectorViz:
         wellspace_gdf_transformed = self.transform_to_image_crs(wellspace_gdf, image_crs)
         segments_gdf_transformed = self.transform_to_image_crs(segments_gdf, image_crs)
 
-        for _, segment in segments_gdf_transformed.iterrows():
-            class_value = segment['class']
-            color = self.health_colors[class_value]
-            
-            if segment.geometry.geom_type == 'Polygon':
-                coords = np.array(segment.geometry.exterior.coords)
-                poly = plt.Polygon(coords, 
-                                 facecolor=color,
-                                 alpha=0.3,
-                                 edgecolor=color,
-                                 linewidth=1,
-                                 zorder=1)
-                ax.add_patch(poly)
-
-        for _, line in lines_gdf_transformed.iterrows():
-            line_class = line['class']
-            distance = line['distance']
-            coords = line.geometry.coords
-            
-            x_coords, y_coords = zip(*coords)
-            
-            ax.plot(x_coords, y_coords, 
-                   color='white',
-                   linestyle='-',
-                   linewidth=3,
-                   alpha=0.7,
-                   zorder=2)
-            
-            ax.plot(x_coords, y_coords, 
-                   color=self.line_colors[line_class],
-                   linestyle='-',
-                   linewidth=2,
-                   alpha=0.7,
-                   zorder=3)
-            
-            dx = coords[1][0] - coords[0][0]
-            dy = coords[1][1] - coords[0][1]
-            mid_x = (coords[0][0] + coords[1][0]) / 2
-            mid_y = (coords[0][1] + coords[1][1]) / 2
-            
-            angle = np.degrees(np.arctan2(dy, dx))
-            
+        # one collection per layer; colours are computed for all features at once
+        polygons = segments_gdf_transformed[segments_gdf_transformed.geom_type == 'Polygon']
+        polygon_colors = [self.health_colors[class_value] for class_value in polygons['class']] if len(polygons) else []
+        ax.add_collection(PolyCollection(
+            [np.asarray(geometry.exterior.coords) for geometry in polygons.geometry],
+            facecolors=polygon_colors,
+            edgecolors=polygon_colors,
+            linewidths=1,
+            alpha=0.3,
+            zorder=1
+        ), autolim=False)
+
+        if len(lines_gdf_transformed):
+            segments = np.array([np.asarray(geometry.coords)[:2] for geometry in lines_gdf_transformed.geometry])
+            line_colors = [self.line_colors[line_class] for line_class in lines_gdf_transformed['class']]
+            ax.add_collection(LineCollection(segments, colors='white', linewidths=3, alpha=0.7,
+                                             capstyle='projecting', zorder=2), autolim=False)
+            ax.add_collection(LineCollection(segments, colors=line_colors, linewidths=2, alpha=0.7,
+                                             capstyle='projecting', zorder=3), autolim=False)
+
+            dx = segments[:, 1, 0] - segments[:, 0, 0]
+            dy = segments[:, 1, 1] - segments[:, 0, 1]
+            mid_x = (segments[:, 0, 0] + segments[:, 1, 0]) / 2
+            mid_y = (segments[:, 0, 1] + segments[:, 1, 1]) / 2
+            angles = np.degrees(np.arctan2(dy, dx))
             line_length = np.sqrt(dx**2 + dy**2)
             offset = 0.1
-            offset_x = -dy / line_length * offset
-            offset_y = dx / line_length * offset
-
-            ax.text(mid_x + offset_x, mid_y + offset_y, 
-                   f'{distance:.2f}m',
-                   color='white',
-                   fontweight='bold', 
-                   fontsize=4,
-                   ha='center',
-                   va='center',
-                   rotation=angle)
-
-        for _, point in wellspace_gdf_transformed.iterrows():
-            x, y = point.geometry.x, point.geometry.y
-            height = point['height_meters']
-            well_spaced = point['class']
-            
-            ax.add_patch(Circle(
-                (x, y),
-                0.2,
-                color='white',
-                zorder=5
-            ))
-            
-            ax.add_patch(Circle(
-                (x, y),
-                0.15,
-                color=self.get_point_color(height),
-                zorder=6
-            ))
-            
-            if well_spaced == '1':
-                ax.add_patch(Circle(
-                    (x, y),
-                    0.07,
-                    color='black',
-                    zorder=7,
-                    alpha=0.5
-                ))
-            
-            ax.text(x, y + 0.3,
-                   f'{height:.2f}m',
-                   color='white',
-                   fontsize=6,
-                   fontweight='bold',
-                   ha='center',
-                   va='bottom',
-                   bbox=dict(
-                       facecolor='black',
-                       edgecolor='none',
-                       alpha=0.7,
-                       pad=0.3,
-                       boxstyle='round'
-                   ),
-                   zorder=8)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                label_x = mid_x - dy / line_length * offset
+                label_y = mid_y + dx / line_length * offset
+
+            # text cannot be batched into a collection, but everything it needs is precomputed
+            for x, y, angle, distance in zip(label_x, label_y, angles, lines_gdf_transformed['distance']):
+                ax.text(x, y, 
+                       f'{distance:.2f}m',
+                       color='white',
+                       fontweight='bold', 
+                       fontsize=4,
+                       ha='center',
+                       va='center',
+                       rotation=angle)
+
+        if len(wellspace_gdf_transformed):
+            xy = np.column_stack([wellspace_gdf_transformed.geometry.x, wellspace_gdf_transformed.geometry.y])
+            heights = wellspace_gdf_transformed['height_meters'].to_numpy(dtype=float)
+            point_colors = np.select([heights <= 1.5, heights <= 2.5], ['orange', 'yellow'], 'lime')
+            well_spaced = (wellspace_gdf_transformed['class'] == '1').to_numpy()
+
+            for radius, colors, zorder, alpha, keep in (
+                    (0.2, 'white', 5, None, slice(None)),
+                    (0.15, point_colors, 6, None, slice(None)),
+                    (0.07, 'black', 7, 0.5, well_spaced)):
+                centers = xy[keep]
+                colors = colors[keep] if isinstance(colors, np.ndarray) else colors
+                ax.add_collection(EllipseCollection(
+                    np.full(len(centers), 2 * radius), np.full(len(centers), 2 * radius), np.zeros(len(centers)),
+                    units='xy',
+                    offsets=centers,
+                    offset_transform=ax.transData,
+                    facecolors=colors,
+                    edgecolors=colors,
+                    linewidths=1,
+                    alpha=alpha,
+                    zorder=zorder
+                ), autolim=False)
+
+            for (x, y), height in zip(xy, heights):
+                ax.text(x, y + 0.3,
+                       f'{height:.2f}m',
+                       color='white',
+                       fontsize=6,
+                       fontweight='bold',
+                       ha='center',
+                       va='bottom',
+                       bbox=dict(
+                           facecolor='black',
+                           edgecolor='none',
+                           alpha=0.7,
+                           pad=0.3,
+                           boxstyle='round'
+                       ),
+                       zorder=8)
 
         ax.set_axis_off()
         plt.tight_layout(pad=0)
@@ -335,15 +335,216 @@ class TreeVectorViz:
         plot_data = np.frombuffer(fig.canvas.buffer_rgba(), dtype=np.uint8)
         plot_data = plot_data.reshape((height, width, 4))[:,:,:3]
         
-        meta.update({
-            'count': 3,
-            'dtype': 'uint8',
-            'width': width,
-            'height': height,
-        })
-        
-        with rasterio.open(output_path, 'w', **meta) as dst:
-            for i in range(3):
-                dst.write(plot_data[:, :, i], i + 1)
+        written = write_rgb(plot_data, output_path, meta, self.cog, self.compress)
                 
         plt.close()
+        if self.preview_format:
+            write_preview(plot_data, output_path, self.preview_format, self.preview_size)
+        return written
+
+
+class TreeRasterViz:
+    """
+    Same layers as TreeVectorViz, drawn with cv2 straight onto the image's own pixel grid
+    (or onto an overview `overview_level` halvings down; by default the first one within max_size)
+    and written with that grid's transform, so the output stays georeferenced. No matplotlib is needed.
+    """
+    def __init__(self, overview_level=None, full_resolution=False, max_size=1600, preview_format=None, preview_size=512,
+                 cog=False, compress='DEFLATE'):
+        self.health_colors = {'0': '#E3412B', '1': '#FBAA35', '2': '#30C876', '3': '#1E8C4D'}
+        self.line_colors = {'0': '#3EBCA1', '1': '#D9D9D9', '2': '#FD3E3E'}
+        self.point_colors = {'orange': (255, 165, 0), 'yellow': (255, 255, 0), 'lime': (0, 255, 0)}
+        self.overview_level = overview_level  # None picks the first level no larger than max_size
+        self.full_resolution = full_resolution  # render on the full image grid
+        self.max_size = max_size
+        self.preview_format = preview_format  # None, 'jpeg' or 'webp'
+        self.preview_size = preview_size
+        self.cog = cog
+        self.compress = compress
+        self.figure_points = 8 * 72  # TreeVectorViz draws the image 8 inches wide; widths are in points of that
+        self.shift = 4  # fractional bits for cv2 coordinates
+
+    def rgb(self, color):
+        if isinstance(color, str) and color.startswith('#'):
+            return tuple(int(color[k:k + 2], 16) for k in (1, 3, 5))
+        return self.point_colors.get(color, color)
+
+    def level(self, src):
+        if self.full_resolution:
+            return 0
+        if self.overview_level is not None:
+            return self.overview_level
+        level = 0
+        while max(src.height, src.width) / 2 ** level > self.max_size:
+            level += 1
+        return level
+
+    def read_rgb(self, src):
+        """First three bands at the overview level as an (H, W, 3) uint8 array, and its transform"""
+        factor = 2 ** self.level(src)
+        height, width = max(src.height // factor, 1), max(src.width // factor, 1)
+        bands = src.read(indexes=list(range(1, min(src.count, 3) + 1)), out_shape=(min(src.count, 3), height, width),
+                         resampling=Resampling.average if factor > 1 else Resampling.nearest)
+        if bands.dtype != np.uint8:
+            # stretch each band like rasterio.plot.show does for non-byte data
+            bands = bands.astype(np.float32)
+            low = bands.min(axis=(1, 2), keepdims=True)
+            span = np.maximum(bands.max(axis=(1, 2), keepdims=True) - low, 1e-12)
+            bands = ((bands - low) / span * 255).astype(np.uint8)
+        if len(bands) < 3:
+            bands = np.repeat(bands[:1], 3, axis=0)
+        transform = src.transform * rasterio.Affine.scale(src.width / width, src.height / height)
+        return np.ascontiguousarray(np.transpose(bands, (1, 2, 0))), transform
+
+    def to_pixels(self, lonlat, crs, transform):
+        """WGS84 (lon, lat) array to fractional (col, row) on the output grid"""
+        lonlat = np.asarray(lonlat, dtype=float).reshape(-1, 2)
+        if len(lonlat) == 0:
+            return lonlat
+        x, y = cached_transformer('EPSG:4326', crs).transform(lonlat[:, 0], lonlat[:, 1])
+        cols, rows = ~transform * (np.asarray(x), np.asarray(y))
+        return np.column_stack([cols, rows])
+
+    def fixed(self, pixels):
+        return np.round(pixels * (1 << self.shift)).astype(np.int32)
+
+    def draw_layer(self, canvas, alpha, draw):
+        """
+        Run draw(overlay, mask) on black scratch buffers with antialiasing, then composite the
+        (premultiplied) overlay with alpha times the mask coverage
+        """
+        overlay = np.zeros_like(canvas)
+        mask = np.zeros(canvas.shape[:2], dtype=np.uint8)
+        draw(overlay, mask)
+        drawn = mask > 0
+        coverage = mask[drawn].astype(np.float32)[:, None] / 255
+        canvas[drawn] = np.clip(canvas[drawn] * (1 - alpha * coverage) + alpha * overlay[drawn] + 0.5, 0, 255).astype(np.uint8)
+
+    def put_label(self, canvas, text, center_x, bottom_y, scale, thickness, box_alpha=None):
+        """White text centred on center_x with its baseline at bottom_y, optionally on a translucent black box"""
+        (width, height), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, scale, thickness)
+        x = int(round(center_x - width / 2))
+        y = int(round(bottom_y))
+        if box_alpha is not None:
+            pad = max(int(round(height * 0.3)), 1)
+            rows = slice(max(y - height - pad, 0), max(y + baseline + pad, 0))
+            cols = slice(max(x - pad, 0), max(x + width + pad, 0))
+            canvas[rows, cols] = (canvas[rows, cols] * (1 - box_alpha) + 0.5).astype(np.uint8)
+        cv2.putText(canvas, text, (x, y), cv2.FONT_HERSHEY_SIMPLEX, scale, (255, 255, 255), thickness, cv2.LINE_AA)
+
+    def render(self, image_path, lines_geojson_path, wellspace_geojson_path, segments_geojson_path):
+        """The annotated RGB array, its transform and CRS"""
+        lines = as_features(lines_geojson_path)
+        wellspace = as_features(wellspace_geojson_path)
+        segments = as_features(segments_geojson_path)
+
+        with open_raster(image_path) as src:
+            if src.crs is None:
+                raise ValueError("Image CRS not found. Please ensure the image has a valid CRS.")
+            canvas, transform = self.read_rgb(src)
+            crs = src.crs
+        centre_y = (transform * (canvas.shape[1] / 2, canvas.shape[0] / 2))[1]
+        metres_per_pixel = pixel_size_metres(transform, crs, centre_y)[0]
+        px_per_point = canvas.shape[1] / self.figure_points
+        one = 1 << self.shift
+
+        def thickness(points):
+            return max(int(round(points * px_per_point)), 1)
+
+        # crowns
+        polygons = [k for k, kind in enumerate(segments.geometry_types) if kind == 'Polygon']
+        if polygons:
+            all_pixels = self.to_pixels(segments.vertices, crs, transform)
+
+            def draw_crowns(overlay, mask):
+                for k in polygons:
+                    ring = self.fixed(all_pixels[segments.offsets[k]:segments.offsets[k + 1]])
+                    color = self.rgb(self.health_colors[segments.properties[k]['class']])
+                    cv2.fillPoly(overlay, [ring], color, cv2.LINE_AA, self.shift)
+                    cv2.polylines(overlay, [ring], True, color, thickness(1), cv2.LINE_AA, self.shift)
+                    cv2.fillPoly(mask, [ring], 255, cv2.LINE_AA, self.shift)
+                    cv2.polylines(mask, [ring], True, 255, thickness(1), cv2.LINE_AA, self.shift)
+            self.draw_layer(canvas, 0.3, draw_crowns)
+
+        # connection lines: white halo, then the class colour
+        if len(lines):
+            ends = self.to_pixels(lines.vertices, crs, transform)
+            starts, stops = ends[lines.offsets[:-1]], ends[lines.offsets[:-1] + 1]
+            classes = [properties['class'] for properties in lines.properties]
+            for width, colors in ((3, ['white'] * len(classes)), (2, [self.line_colors[c] for c in classes])):
+                def draw_lines(overlay, mask, width=width, colors=colors):
+                    for a, b, color in zip(self.fixed(starts), self.fixed(stops), colors):
+                        color = (255, 255, 255) if color == 'white' else self.rgb(color)
+                        cv2.line(overlay, tuple(a.tolist()), tuple(b.tolist()), color, thickness(width), cv2.LINE_AA, self.shift)
+                        cv2.line(mask, tuple(a.tolist()), tuple(b.tolist()), 255, thickness(width), cv2.LINE_AA, self.shift)
+                self.draw_layer(canvas, 0.7, draw_lines)
+
+            # labels are drawn horizontally, offset to the left of the line direction like TreeVectorViz
+            direction = stops - starts
+            length = np.maximum(np.hypot(direction[:, 0], direction[:, 1]), 1e-12)
+            offset = 0.1 / metres_per_pixel
+            label_x = (starts[:, 0] + stops[:, 0]) / 2 + direction[:, 1] / length * offset
+            label_y = (starts[:, 1] + stops[:, 1]) / 2 - direction[:, 0] / length * offset
+            scale = 4 * px_per_point / 22
+            for x, y, properties in zip(label_x, label_y, lines.properties):
+                self.put_label(canvas, f"{properties['distance']:.2f}m", x, y + 2 * px_per_point, scale, thickness(0.6))
+
+        # trees: white ring, height colour, and a dark dot for well-spaced trees
+        if len(wellspace):
+            centers = self.to_pixels(wellspace.vertices[wellspace.offsets[:-1]], crs, transform)
+            heights = wellspace.values('height_meters')
+            colors = np.select([heights <= 1.5, heights <= 2.5], ['orange', 'yellow'], 'lime')
+            well_spaced = np.array([properties.get('class') == '1' for properties in wellspace.properties], dtype=bool)
+            fixed_centers = self.fixed(centers)
+            for radius, color in ((0.2, None), (0.15, colors)):
+                radius_fixed = int(round(radius / metres_per_pixel * one))
+                for k, center in enumerate(fixed_centers):
+                    fill = (255, 255, 255) if color is None else self.rgb(str(color[k]))
+                    cv2.circle(canvas, tuple(center.tolist()), radius_fixed, fill, -1, cv2.LINE_AA, self.shift)
+            radius_fixed = int(round(0.07 / metres_per_pixel * one))
+
+            def draw_dots(overlay, mask):
+                for center in fixed_centers[well_spaced]:
+                    cv2.circle(overlay, tuple(center.tolist()), radius_fixed, (0, 0, 0), -1, cv2.LINE_AA, self.shift)
+                    cv2.circle(mask, tuple(center.tolist()), radius_fixed, 255, -1, cv2.LINE_AA, self.shift)
+            self.draw_layer(canvas, 0.5, draw_dots)
+
+            scale = 6 * px_per_point / 22
+            for (x, y), height in zip(centers, heights):
+                self.put_label(canvas, f'{height:.2f}m', x, y - 0.3 / metres_per_pixel - 2 * px_per_point,
+                               scale, thickness(0.8), box_alpha=0.7)
+
+        return canvas, transform, crs
+
+    def plot_vector_visualization(self, image_path, lines_geojson_path, wellspace_geojson_path,
+                                  segments_geojson_path, output_path):
+        """Drop-in for TreeVectorViz.plot_vector_visualization writing a GeoTIFF on the image grid; returns the write stats"""
+        canvas, transform, crs = self.render(image_path, lines_geojson_path, wellspace_geojson_path,
+                                             segments_geojson_path)
+        written = write_rgb(canvas, output_path, {'crs': crs, 'transform': transform}, self.cog, self.compress)
+        if self.preview_format:
+            write_preview(canvas, output_path, self.preview_format, self.preview_size)
+        return written
+
+
+def benchmark_renderers(image_path, lines_path, wellspace_path, segments_path, folder, repeat=3):
+    """Best-of-`repeat` seconds per plot for the matplotlib and cv2 visualization renderers"""
+    results = {}
+    for name, renderer in (('matplotlib', TreeVectorViz()), ('opencv', TreeRasterViz())):
+        output_path = os.path.join(folder, f'benchmark_{name}.tif')
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            renderer.plot_vector_visualization(image_path, lines_path, wellspace_path, segments_path, output_path)
+            times.append(time.perf_counter() - start)
+        results[name] = {'seconds': min(times), 'size_bytes': os.path.getsize(output_path)}
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+    import tempfile
+    # python overall_utils.py image.tif lines.geojson wellspace.geojson health.geojson
+    with tempfile.TemporaryDirectory() as folder:
+        for name, stats in benchmark_renderers(*sys.argv[1:5], folder).items():
+            print(name, stats)
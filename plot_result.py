@@ -0,0 +1,51 @@
+import numpy as np
+from annotation_cache import ParsedFeatures
+from vector_output import write_features
+
+
+def point_layer(coords, properties):
+    """Point layer from an (N, 2) coordinate array"""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    return ParsedFeatures(coords, np.arange(len(coords) + 1, dtype=np.int64),
+                          properties=list(properties), geometry_types=['Point'] * len(coords))
+
+
+def line_layer(starts, ends, properties):
+    """Two-vertex LineString layer from (M, 2) start and end coordinate arrays"""
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    vertices = np.empty((2 * len(starts), 2))
+    vertices[0::2] = starts
+    vertices[1::2] = np.asarray(ends, dtype=float).reshape(-1, 2)
+    return ParsedFeatures(vertices, np.arange(0, len(vertices) + 1, 2, dtype=np.int64),
+                          properties=list(properties), geometry_types=['LineString'] * len(starts))
+
+
+class PlotResult:
+    """
+    In-memory outputs of one plot, handed directly from stage to stage.
+    Every layer is a WGS84 ParsedFeatures; files are only written by write() once the plot is done.
+    """
+    def __init__(self, name=None):
+        self.name = name
+        self.health = None  # crown polygons with height / vari / class properties
+        self.wellspace = None  # one point per tree, class '1' when well spaced
+        self.lines = None  # connection lines between close trees
+        self.neighbors = None  # spatial_index.NeighborIndex of the health layer
+
+    @property
+    def centroids(self):
+        return self.health.centroids()
+
+    @property
+    def heights(self):
+        return self.health.values('height_meters')
+
+    @property
+    def classes(self):
+        return [properties.get('class') for properties in self.health.properties]
+
+    def write(self, health_path=None, wellspace_path=None, lines_path=None, output_format='geojson'):
+        """Write the final artifacts; layers without a path stay in memory only"""
+        for layer, path in ((self.health, health_path), (self.wellspace, wellspace_path), (self.lines, lines_path)):
+            if layer is not None and path is not None:
+                write_features(layer.to_features(), path, output_format)
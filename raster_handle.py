@@ -0,0 +1,97 @@
+import math
+from contextlib import contextmanager
+import rasterio
+from pyproj import CRS
+from distance import radii_of_curvature
+
+
+class RasterHandle:
+    """
+    One plot's raster, opened once and shared by every stage. Bounds, transform, CRS, GSD and
+    ground area are read or computed once; reads (full or windowed) go through the same dataset.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.dataset = rasterio.open(path)
+        self.bounds = self.dataset.bounds
+        self.transform = self.dataset.transform
+        self.crs = self.dataset.crs
+        self.width = self.dataset.width
+        self.height = self.dataset.height
+        self.count = self.dataset.count
+        self.meta = self.dataset.meta.copy()
+        self._gsd = None
+        self._area = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.dataset.close()
+
+    def read(self, *args, **kwargs):
+        return self.dataset.read(*args, **kwargs)
+
+    @property
+    def gsd(self):
+        """(x, y) pixel size in metres; for geographic rasters at the centre latitude"""
+        if self._gsd is None:
+            self._gsd = pixel_size_metres(self.transform, self.crs, (self.bounds.bottom + self.bounds.top) / 2)
+        return self._gsd
+
+    @property
+    def area(self):
+        """
+        Ground area of the raster footprint in square metres, from the affine and the CRS:
+        pixel count times pixel area for projected rasters, the exact ellipsoidal area of the
+        lon/lat rectangle for geographic ones
+        """
+        if self._area is None:
+            if self.crs is not None and self.crs.is_geographic:
+                self._area = geographic_rectangle_area(self.bounds, CRS.from_user_input(self.crs.to_wkt()).ellipsoid)
+            else:
+                unit = self.crs.linear_units_factor[1] if self.crs is not None else 1.0
+                pixel_area = abs(self.transform.a * self.transform.e - self.transform.b * self.transform.d)
+                self._area = self.width * self.height * pixel_area * unit * unit
+        return self._area
+
+
+def pixel_size_metres(transform, crs, latitude=0.0):
+    """(x, y) pixel size of an affine in metres; geographic CRSs are measured at `latitude`"""
+    size = (math.hypot(transform.a, transform.d), math.hypot(transform.b, transform.e))
+    if crs is not None and crs.is_geographic:
+        lat = math.radians(latitude)
+        meridian, prime_vertical = radii_of_curvature(lat)
+        return math.radians(size[0]) * prime_vertical * math.cos(lat), math.radians(size[1]) * meridian
+    unit = crs.linear_units_factor[1] if crs is not None else 1.0
+    return size[0] * unit, size[1] * unit
+
+
+def geographic_rectangle_area(bounds, ellipsoid):
+    """Area (m^2) of the ellipsoid between two meridians and two parallels"""
+    a = ellipsoid.semi_major_metre
+    f = 1 / ellipsoid.inverse_flattening if ellipsoid.inverse_flattening else 0.0
+    b = a * (1 - f)
+    e = math.sqrt(f * (2 - f))
+
+    def zone(lat):
+        s = math.sin(math.radians(lat))
+        if e == 0:
+            return s
+        return s / (2 * (1 - e * e * s * s)) + math.log((1 + e * s) / (1 - e * s)) / (4 * e)
+
+    d_lon = math.radians(abs(bounds.right - bounds.left))
+    return abs(d_lon * b * b * (zone(bounds.top) - zone(bounds.bottom)))
+
+
+@contextmanager
+def open_raster(source):
+    """The dataset of a RasterHandle (left open) or of a path (closed on exit)"""
+    if isinstance(source, RasterHandle):
+        yield source.dataset
+    else:
+        with rasterio.open(source) as src:
+            yield src
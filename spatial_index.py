@@ -0,0 +1,96 @@
+import numpy as np
+from distance import project_local, pair_distances
+
+
+class GridIndex:
+    """
+    Uniform grid hash over projected points with cells of `radius` metres,
+    so only points in the same or adjacent cells are ever compared
+    """
+    # each unordered pair of adjacent cells is visited once
+    HALF_NEIGHBOURHOOD = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+
+    def __init__(self, xy, radius):
+        self.xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        self.radius = float(radius)
+        if len(self.xy):
+            cells = np.floor((self.xy - self.xy.min(0)) / self.radius).astype(np.int64) + 1
+        else:
+            cells = np.zeros((0, 2), dtype=np.int64)
+        self.row_length = int(cells[:, 0].max()) + 2 if len(cells) else 1
+        keys = cells[:, 1] * self.row_length + cells[:, 0]
+        self.order = np.argsort(keys, kind='stable')
+        self.keys, self.starts, self.counts = np.unique(keys[self.order], return_index=True, return_counts=True)
+
+    def candidate_pairs(self):
+        """Index pairs (i < j) of points in the same or neighbouring cells"""
+        first, second = [], []
+        for dx, dy in self.HALF_NEIGHBOURHOOD:
+            wanted = self.keys + dy * self.row_length + dx
+            position = np.minimum(np.searchsorted(self.keys, wanted), max(len(self.keys) - 1, 0))
+            hit = np.flatnonzero(self.keys[position] == wanted) if len(self.keys) else np.zeros(0, dtype=np.int64)
+            a, b = hit, position[hit]
+            count_a, count_b = self.counts[a], self.counts[b]
+            sizes = count_a * count_b
+            total = int(sizes.sum())
+            if total == 0:
+                continue
+            group = np.repeat(np.arange(len(a)), sizes)
+            local = np.arange(total) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+            i = self.order[self.starts[a][group] + local // count_b[group]]
+            j = self.order[self.starts[b][group] + local % count_b[group]]
+            if dx == 0 and dy == 0:
+                keep = i < j
+                i, j = i[keep], j[keep]
+            first.append(np.minimum(i, j))
+            second.append(np.maximum(i, j))
+
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        i, j = np.concatenate(first), np.concatenate(second)
+        order = np.lexsort((j, i))
+        return i[order], j[order]
+
+    def pairs_within(self, radius=None):
+        """Index pairs (i < j) no further apart than radius in the projected plane, sorted by (i, j)"""
+        radius = self.radius if radius is None else radius
+        i, j = self.candidate_pairs()
+        d = np.hypot(*(self.xy[i] - self.xy[j]).T)
+        keep = d <= radius
+        return i[keep], j[keep], d[keep]
+
+
+def neighbor_pairs(lonlat, radius, tolerance=0.01):
+    """
+    Candidate (i, j) pairs whose true distance may be within radius metres. The search radius is
+    widened by `tolerance` (relative, plus 1 cm) to cover the flat-plane approximation, so callers
+    measuring the candidates exactly get the same pairs as a brute-force scan.
+    """
+    search = radius * (1 + tolerance) + 0.01
+    i, j, _ = GridIndex(project_local(lonlat), search).pairs_within(search)
+    return i, j
+
+
+class NeighborIndex:
+    """
+    One plot's tree centroids and every pair within `radius` metres with its distance.
+    Built once from the health features and shared by the well-spacing and connection stages.
+    """
+    def __init__(self, features, radius=3, exact=False):
+        self.centroids = features.centroids()  # (lon, lat)
+        self.radius = radius
+        self.exact = exact  # batched Geod.inv instead of the local tangent plane
+        first, second = neighbor_pairs(self.centroids, radius)
+        distances = pair_distances(self.centroids, first, second, exact=exact)
+        keep = distances <= radius
+        self.first, self.second, self.distances = first[keep], second[keep], distances[keep]
+
+    def __len__(self):
+        return len(self.centroids)
+
+    def pairs_within(self, radius):
+        """(first, second, distances) of the pairs no further apart than radius, sorted by (first, second)"""
+        if radius > self.radius:
+            raise ValueError(f"Neighbour index covers {self.radius} m, {radius} m requested")
+        keep = self.distances <= radius
+        return self.first[keep], self.second[keep], self.distances[keep]
@@ -0,0 +1,22 @@
+import numpy as np
+import rasterio
+from utils_plant import UtilsHealth
+
+# 5 cm imagery over a 0.5 m DEM, both with their upper-left corner at (0, 10)
+IMAGE_TRANSFORM = rasterio.Affine(0.05, 0, 0, 0, -0.05, 10)
+DEM_TRANSFORM = rasterio.Affine(0.5, 0, 0, 0, -0.5, 10)
+DEM = np.arange(16, dtype=np.float32).reshape(4, 4)
+
+
+def test_crown_smaller_than_a_dem_cell_takes_the_cell_under_its_centroid():
+    # 15 cm square inside DEM cell (row 1, col 2), clear of that cell's centre
+    crown = [[21, 11], [24, 11], [24, 14], [21, 14]]
+    height = UtilsHealth({}).height_calculator(DEM, DEM_TRANSFORM, crown, IMAGE_TRANSFORM, exact=True, offset=0.0)
+    assert height == DEM[1, 2]
+
+
+def test_crown_covering_dem_cell_centres_uses_only_those_cells():
+    # 1 m square over cells (0..1, 0..1); it contains their four centres
+    crown = [[0, 0], [20, 0], [20, 20], [0, 20]]
+    height = UtilsHealth({}).height_calculator(DEM, DEM_TRANSFORM, crown, IMAGE_TRANSFORM, exact=True, offset=0.0)
+    assert height == np.mean([DEM[0, 0], DEM[0, 1], DEM[1, 0], DEM[1, 1]])
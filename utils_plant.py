@@ -1,27 +1,52 @@
 import rasterio
-import json
 import numpy as np
 import cv2
 from shapely.geometry import Polygon, mapping
 import geopandas as gpd
 import math
 from rasterio.enums import Resampling
+from rasterio.windows import Window
+from rasterio.vrt import WarpedVRT
+from rasterio.features import rasterize
 from pyproj import CRS, Transformer
+from annotation_cache import ANNOTATIONS, ParsedFeatures
+from vector_output import write_features
+from raster_handle import open_raster, pixel_size_metres
+
+_TRANSFORMERS = {}
+
+def cached_transformer(source_crs, target_crs):
+    """Transformer for a (source, target) CRS pair, built once per worker process"""
+    key = (str(source_crs), str(target_crs))
+    if key not in _TRANSFORMERS:
+        _TRANSFORMERS[key] = Transformer.from_crs(source_crs, target_crs, always_xy=True)
+    return _TRANSFORMERS[key]
 
 class UtilsHealth:
-    def __init__(self, reference_areas):
+    def __init__(self, reference_areas, windowed=False, height_top_k=10, height_stat="mean", height_percentile=95,
+                 vari_dtype=np.float32, native_resolution=False, native_dem=False,
+                 output_format='geojson'):
         self.reference_areas = reference_areas
         self.target_gsd = 0.02  # this is in meters
+        self.windowed = windowed  # read only the raster windows covering trees
+        self.window_pad = 2  # source pixels kept around each tree box for bilinear edges
+        self.height_top_k = height_top_k  # highest DEM cells averaged per crown
+        self.height_stat = height_stat  # "mean" / "max" of the top-k cells, or "percentile" of the crown
+        self.height_percentile = height_percentile
+        self.vari_dtype = vari_dtype  # np.float64 reproduces the old full-precision VARI
+        self.zonal_block_rows = 1024
+        self.vari_strip_rows = 512  # target-grid rows per strip of the windowed VARI range pass
+        self.native_resolution = native_resolution  # rasterise on the source grid instead of upsampling to target_gsd
+        self.native_dem = native_dem  # sample heights on the DEM's own grid instead of resampling it
+        self.output_format = output_format  # 'geojson', 'flatgeobuf' or 'geoparquet'
+        self._breakpoints = {}  # (species, pixel area) -> precomputed reference table
         self.wgs84 = CRS('EPSG:4326')
 
     def json_loader(self, json_path):
-        with open(json_path, 'r') as f:
-            data = json.load(f)
+        shapes = ANNOTATIONS.labelme(json_path)
         results = []
-        for shape in data.get("shapes", []):
-            label = shape.get("label", "")
-            points = shape.get("points", [])
-            results.append({"label": label, "points": points})
+        for i, label in enumerate(shapes.labels):
+            results.append({"label": label, "points": shapes.coords(i).tolist()})
         return results
 
     def resample_raster(self, src, scale_factor):
@@ -43,6 +68,164 @@ class UtilsHealth:
         )
         return data, transform
 
+    def polygon_windows(self, point_label, width, height):
+        """
+        Bounding boxes of all polygons (source pixels), merged until no two overlap.
+        Returns a list of (Window, polygon indices) pairs.
+        """
+        pad = self.window_pad
+        boxes = []
+        for i, obj in enumerate(point_label):
+            points = np.asarray(obj["points"], dtype=float)
+            if len(points) == 0:
+                continue
+            boxes.append([
+                max(int(np.floor(points[:, 0].min())) - pad, 0),
+                max(int(np.floor(points[:, 1].min())) - pad, 0),
+                min(int(np.ceil(points[:, 0].max())) + pad + 1, width),
+                min(int(np.ceil(points[:, 1].max())) + pad + 1, height),
+                [i]
+            ])
+
+        merged = self.merge_boxes(boxes)
+        return [(Window(c0, r0, c1 - c0, r1 - r0), sorted(ids)) for c0, r0, c1, r1, ids in merged]
+
+    def merge_boxes(self, boxes):
+        """
+        Merge [col0, row0, col1, row1, ids] boxes until no two overlap. Each pass finds the
+        overlapping pairs with a sort-and-sweep along the columns and replaces every connected
+        group by its bounding box; passes repeat while grown boxes still overlap new ones.
+        """
+        while True:
+            boxes = sorted(boxes, key=lambda b: (b[0], b[1]))
+            parent = list(range(len(boxes)))
+
+            def root(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            active = []
+            merged_any = False
+            for i, box in enumerate(boxes):
+                # boxes whose right edge is at or left of this box's left edge can never overlap again
+                active = [j for j in active if boxes[j][2] > box[0]]
+                for j in active:
+                    if box[1] < boxes[j][3] and boxes[j][1] < box[3] and root(i) != root(j):
+                        parent[root(i)] = root(j)
+                        merged_any = True
+                active.append(i)
+            if not merged_any:
+                return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+            groups = {}
+            for i, box in enumerate(boxes):
+                group = groups.setdefault(root(i), [box[0], box[1], box[2], box[3], []])
+                group[0], group[1] = min(group[0], box[0]), min(group[1], box[1])
+                group[2], group[3] = max(group[2], box[2]), max(group[3], box[3])
+                group[4] = group[4] + box[4]
+            boxes = list(groups.values())
+
+    def outer_window(self, window, width, height):
+        """Snap a fractional window outwards to whole pixels, padded and clipped to the raster"""
+        pad = self.window_pad
+        col0 = max(int(math.floor(window.col_off)) - pad, 0)
+        row0 = max(int(math.floor(window.row_off)) - pad, 0)
+        col1 = min(int(math.ceil(window.col_off + window.width)) + pad, width)
+        row1 = min(int(math.ceil(window.row_off + window.height)) + pad, height)
+        return Window(col0, row0, max(col1 - col0, 0), max(row1 - row0, 0))
+
+    def resample_window(self, src, window, scale_factor):
+        """
+        Read one window resampled to the target grid. The window is snapped to whole pixels of
+        the grid resample_raster would produce and read as the matching fractional source window,
+        so every output pixel is sampled at the same position as in the full read.
+        Returns the data, its transform and its (col, row) offset on that grid.
+        """
+        out_width = int(src.width * scale_factor)
+        out_height = int(src.height * scale_factor)
+        x_ratio = src.width / out_width
+        y_ratio = src.height / out_height
+        col0 = max(int(math.floor(window.col_off / x_ratio)), 0)
+        row0 = max(int(math.floor(window.row_off / y_ratio)), 0)
+        col1 = min(max(int(math.ceil((window.col_off + window.width) / x_ratio)), col0 + 1), out_width)
+        row1 = min(max(int(math.ceil((window.row_off + window.height) / y_ratio)), row0 + 1), out_height)
+        return self.resample_target(src, col0, row0, col1, row1, scale_factor)
+
+    def resample_target(self, src, col0, row0, col1, row1, scale_factor):
+        """
+        Read target-grid pixels [row0:row1, col0:col1] of the grid resample_raster produces,
+        as the matching fractional source window. Returns the data, its transform and offset.
+        """
+        x_ratio = src.width / int(src.width * scale_factor)
+        y_ratio = src.height / int(src.height * scale_factor)
+        data = src.read(
+            window=Window(col0 * x_ratio, row0 * y_ratio, (col1 - col0) * x_ratio, (row1 - row0) * y_ratio),
+            out_shape=(src.count, row1 - row0, col1 - col0),
+            resampling=Resampling.bilinear
+        )
+        transform = rasterio.Affine(
+            src.transform.a / scale_factor,
+            src.transform.b,
+            src.transform.c,
+            src.transform.d,
+            src.transform.e / scale_factor,
+            src.transform.f
+        ) * rasterio.Affine.translation(col0, row0)
+        return data, transform, (col0, row0)
+
+    def vari_range(self, src, scale_factor):
+        """
+        Min and max raw VARI over the whole resampled image, read in row strips so memory stays
+        bounded by vari_strip_rows; windowed runs normalise with it exactly like the full read
+        """
+        out_width = int(src.width * scale_factor)
+        out_height = int(src.height * scale_factor)
+        vari_min, vari_max = np.inf, -np.inf
+        for row0 in range(0, out_height, self.vari_strip_rows):
+            row1 = min(row0 + self.vari_strip_rows, out_height)
+            strip, _, _ = self.resample_target(src, 0, row0, out_width, row1, scale_factor)
+            vari = self.raw_vari(strip)
+            vari_min, vari_max = min(vari_min, vari.min()), max(vari_max, vari.max())
+        return vari_min, vari_max
+
+    def read_tiles(self, img_src, dem_src, point_label, scale_factor):
+        """
+        Yield (rgb, dem, rgb_transform, dem_transform, offset, polygon indices) tiles.
+        Without windowing this is a single tile holding the fully resampled rasters.
+        """
+        if not self.windowed:
+            rgb_data, rgb_transform = self.resample_raster(img_src, scale_factor)
+            if self.native_dem:
+                dem, dem_transform = dem_src.read(1), dem_src.transform
+            else:
+                dem_data, dem_transform = self.resample_raster(dem_src, scale_factor)
+                dem = dem_data[0]
+            yield rgb_data, dem, rgb_transform, dem_transform, (0, 0), list(range(len(point_label)))
+            return
+
+        for window, indices in self.polygon_windows(point_label, img_src.width, img_src.height):
+            rgb_data, rgb_transform, offset = self.resample_window(img_src, window, scale_factor)
+            left, bottom, right, top = rasterio.windows.bounds(window, img_src.transform)
+            dem_window = self.outer_window(
+                rasterio.windows.from_bounds(left, bottom, right, top, dem_src.transform),
+                dem_src.width, dem_src.height
+            )
+            if self.native_dem:
+                dem = dem_src.read(1, window=dem_window)
+                dem_transform = rasterio.windows.transform(dem_window, dem_src.transform)
+            else:
+                dem_data, dem_transform, _ = self.resample_window(dem_src, dem_window, scale_factor)
+                dem = dem_data[0]
+            yield rgb_data, dem, rgb_transform, dem_transform, offset, indices
+
+    def aligned_dem(self, dem_src, crs):
+        """The DEM on its own grid, warped through a WarpedVRT only when its CRS differs from the imagery"""
+        if crs is None or dem_src.crs == crs:
+            return dem_src
+        return WarpedVRT(dem_src, crs=crs, resampling=Resampling.bilinear)
+
     def convert_gsd_to_meters(self, gsd_degrees, latitude):
         lat_length_meters = 111139 
         lon_length_meters = 111139  * math.cos(math.radians(latitude))
@@ -52,89 +235,193 @@ class UtilsHealth:
         )
         return gsd_meters
 
-    def vari_calculator(self, rgb_data):
-        red_band = rgb_data[0].astype(float)
-        green_band = rgb_data[1].astype(float)
-        blue_band = rgb_data[2].astype(float)
-        
-        vari = (green_band - red_band) / (green_band + red_band - blue_band + 1e-10)
-        vari_min = vari.min()
-        vari_max = vari.max()
-        normalized_vari = (vari - vari_min) / (vari_max - vari_min)
-        return normalized_vari
-
-    def zonal_sum_calculate(self, points, shape, vari):
-        segment_mask = self.create_segment_mask(points, shape)
-        masked_vari = vari * segment_mask
-        pixel_count = np.sum(segment_mask)
-        mean_vari = np.sum(masked_vari) / (pixel_count + 1e-10)
-        return mean_vari, pixel_count
-
-    def height_calculator(self, dem, dem_transform, points, img_transform):
-        dem_points = []
-        for point in points:
-            geo_x, geo_y = rasterio.transform.xy(img_transform, point[1], point[0])
-            dem_row, dem_col = rasterio.transform.rowcol(dem_transform, geo_x, geo_y)
-            dem_points.append([dem_col, dem_row])
-        mask = self.create_segment_mask(dem_points, dem.shape)
-        masked_dem = dem[mask == 1]
+    def raw_vari(self, rgb_data, dtype=None, out=None):
+        """
+        VARI = (G - R) / (G + R - B) computed with two image-sized buffers of the chosen dtype.
+        The bands are cast inside the ufuncs, so no converted copy of the bands is made.
+        """
+        dtype = self.vari_dtype if dtype is None else dtype
+        shape = rgb_data.shape[1:]
+        vari = np.empty(shape, dtype=dtype) if out is None else out
+        denominator = np.empty(shape, dtype=dtype)
+
+        np.add(rgb_data[1], rgb_data[0], out=denominator, dtype=dtype)
+        np.subtract(denominator, rgb_data[2], out=denominator, dtype=dtype)
+        denominator += 1e-10
+        np.subtract(rgb_data[1], rgb_data[0], out=vari, dtype=dtype)
+        np.divide(vari, denominator, out=vari)
+        return vari
+
+    def normalize_vari(self, vari, vari_min, vari_max):
+        """Min-max normalise VARI in place"""
+        vari -= vari_min
+        vari /= (vari_max - vari_min)
+        return vari
+
+    def vari_calculator(self, rgb_data, dtype=None):
+        vari = self.raw_vari(rgb_data, dtype=dtype)
+        return self.normalize_vari(vari, vari.min(), vari.max())
+
+    def zonal_stats(self, polygons, shape, vari, exact=False):
+        """
+        Per-polygon pixel_count, vari_sum and vari_mean from one label raster.
+        Later polygons overwrite earlier ones where crowns overlap; a polygon whose own cropped
+        mask finds another label under it falls back to that mask, so shared pixels count for both.
+        """
+        n = len(polygons)
+        labels = self.label_raster(polygons, shape, exact=exact)
+        # bincount casts to intp and float64, so feed it row blocks rather than the whole image
+        pixel_count = np.zeros(n + 1, dtype=np.int64)
+        vari_sum = np.zeros(n + 1)
+        for start in range(0, shape[0], self.zonal_block_rows):
+            block = slice(start, start + self.zonal_block_rows)
+            pixel_count += np.bincount(labels[block].ravel(), minlength=n + 1)
+            vari_sum += np.bincount(labels[block].ravel(), weights=vari[block].ravel(), minlength=n + 1)
+        pixel_count = pixel_count[1:]
+        vari_sum = vari_sum[1:]
+
+        for i, points in enumerate(polygons):
+            mask, rows, cols = self.crop_segment_mask(points, shape, exact=exact)
+            if np.any(labels[rows, cols][mask == 1] != i + 1):
+                pixel_count[i] = np.sum(mask)
+                vari_sum[i] = np.sum(vari[rows, cols] * mask)
+
+        return {
+            "pixel_count": pixel_count,
+            "vari_sum": vari_sum,
+            "vari_mean": vari_sum / (pixel_count + 1e-10),
+        }
+
+    def label_raster(self, polygons, shape, exact=False):
+        dtype = np.uint16 if len(polygons) < np.iinfo(np.uint16).max else np.int32
+        if exact:
+            return self.rasterize_centres(polygons, shape, dtype)
+        labels = np.zeros(shape, dtype=dtype)
+        for i, points in enumerate(polygons):
+            cv2.fillPoly(labels, [np.asarray(points, dtype=np.int32)], i + 1)
+        return labels
+
+    def rasterize_centres(self, polygons, shape, dtype=np.uint8, origin=(0, 0)):
+        """
+        Burn polygons given in fractional (col, row) pixel coordinates, label i + 1 for polygon i,
+        into the pixels whose centre lies inside them; later polygons overwrite earlier ones
+        """
+        shapes = []
+        for i, points in enumerate(polygons):
+            ring = np.asarray(points, dtype=float).reshape(-1, 2) - np.asarray(origin, dtype=float)
+            if len(ring) >= 3:
+                shapes.append(({"type": "Polygon", "coordinates": [np.vstack([ring, ring[:1]]).tolist()]}, i + 1))
+        if not shapes or 0 in shape:
+            return np.zeros(shape, dtype=dtype)
+        return rasterize(shapes, out_shape=shape, fill=0, all_touched=False, dtype=dtype)
+
+    def height_calculator(self, dem, dem_transform, points, img_transform, exact=False, offset=0.5):
+        """
+        Crown height from the DEM cells under the crown. `offset` places the image points on their
+        pixels (0.5 for integer pixel indices, 0 for fractional LabelMe coordinates); exact=True
+        keeps the crown's sub-cell position on the DEM and takes the cells whose centre it contains;
+        a crown smaller than a cell that contains no centre takes the cell under its centroid.
+        """
+        geo_x, geo_y = self.pixels_to_geo(points, img_transform, offset=offset)
+        dem_cols, dem_rows = self.geo_to_pixels(geo_x, geo_y, dem_transform, floor=not exact)
+        dem_points = np.column_stack([dem_cols, dem_rows])
+        mask, rows, cols = self.crop_segment_mask(dem_points, dem.shape, exact=exact)
+        masked_dem = dem[rows, cols][mask == 1]
+        if len(masked_dem) == 0 and exact and len(dem_points):
+            col, row = np.floor(ParsedFeatures(dem_points, np.array([0, len(dem_points)])).centroids()[0])
+            if 0 <= row < dem.shape[0] and 0 <= col < dem.shape[1]:
+                masked_dem = dem[int(row), int(col)].reshape(1)
         if len(masked_dem) == 0:
             return np.nan
-        top_values = np.sort(masked_dem.flatten())[-10:]
-        return np.mean(top_values)
+        return self.crown_height(masked_dem)
 
-    def create_segment_mask(self, points, shape):
-        mask = np.zeros(shape, dtype=np.uint8)
-        poly_points = np.array(points, dtype=np.int64)
-        cv2.fillPoly(mask, [poly_points], 1)
-        return mask
+    def crown_height(self, values, k=None, stat=None):
+        """
+        Height of one crown from its DEM cells: mean or max of the top-k cells
+        (partial selection, no full sort), or a percentile of all cells.
+        """
+        k = self.height_top_k if k is None else k
+        stat = self.height_stat if stat is None else stat
+        if stat == "percentile":
+            return np.percentile(values, self.height_percentile)
+        if stat == "max":
+            return np.max(values)
+        if stat != "mean":
+            raise ValueError(f"Unknown height statistic: {stat}")
+        if len(values) > k:
+            values = np.partition(values, len(values) - k)[-k:]
+        # sorted so the mean is summed in the same order as the old full sort
+        return np.mean(np.sort(values))
 
-    def pixel_to_geo(self, pixel, transform):
-        x, y = pixel
-        geo_x, geo_y = rasterio.transform.xy(transform, y, x, offset='ul')
-        return geo_x, geo_y
+    def crop_segment_mask(self, points, shape, exact=False):
+        """
+        Mask of a polygon rasterised only inside its bounding box, with the row/col slices it covers.
+        By default vertices are truncated to pixels and cv2 fills every pixel the outline touches;
+        exact=True keeps fractional vertices and takes the pixels whose centre is inside.
+        """
+        poly_points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if not exact:
+            poly_points = poly_points.astype(np.int32)
+        col0 = min(max(int(np.floor(poly_points[:, 0].min())), 0), shape[1])
+        row0 = min(max(int(np.floor(poly_points[:, 1].min())), 0), shape[0])
+        col1 = min(max(int(np.ceil(poly_points[:, 0].max())) + 1, col0), shape[1])
+        row1 = min(max(int(np.ceil(poly_points[:, 1].max())) + 1, row0), shape[0])
+        if exact:
+            mask = self.rasterize_centres([poly_points], (row1 - row0, col1 - col0), origin=(col0, row0))
+            return mask, slice(row0, row1), slice(col0, col1)
+        mask = np.zeros((row1 - row0, col1 - col0), dtype=np.uint8)
+        if mask.size:
+            cv2.fillPoly(mask, [poly_points - np.array([col0, row0], dtype=np.int32)], 1)
+        return mask, slice(row0, row1), slice(col0, col1)
 
-    def save_as_geojson(self, features, output_file, source_crs):
+    def pixels_to_geo(self, pixels, transform, offset=0.0):
         """
-        Save features as GeoJSON with coordinates in WGS84
+        Apply the affine to an (N, 2) array of (col, row) pixels in one go.
+        offset=0 is the upper-left corner of each pixel, 0.5 its centre.
         """
-       
-        transformed_features = []
-        for feature in features:
-            transformed_feature = feature.copy()
-            transformed_feature['geometry'] = self.transform_coordinates(
-                feature['geometry'],
-                source_crs
-            )
-            transformed_features.append(transformed_feature)
+        pixels = np.asarray(pixels, dtype=float).reshape(-1, 2)
+        cols = pixels[:, 0] + offset
+        rows = pixels[:, 1] + offset
+        xs = transform.a * cols + transform.b * rows + transform.c
+        ys = transform.d * cols + transform.e * rows + transform.f
+        return xs, ys
 
-        geojson = {
-            "type": "FeatureCollection",
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": "urn:ogc:def:crs:EPSG::4326"
-                }
-            },
-            "features": transformed_features
-        }
-        
-        with open(output_file, 'w') as f:
-            json.dump(geojson, f, indent=4)
+    def geo_to_pixels(self, xs, ys, transform, floor=True):
+        """
+        Vectorised rasterio.transform.rowcol: map x/y arrays to integer (col, row) arrays,
+        or to fractional pixel positions with floor=False
+        """
+        inverse = ~transform
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        cols = inverse.a * xs + inverse.b * ys + inverse.c
+        rows = inverse.d * xs + inverse.e * ys + inverse.f
+        if not floor:
+            return cols, rows
+        return np.floor(cols).astype(np.int64), np.floor(rows).astype(np.int64)
 
-    def convert_area_to_pixels(self, area_m2):
+    def save_as_geojson(self, features, output_file, source_crs):
+        """
+        Save features with coordinates in WGS84, in self.output_format
+        """
+        write_features(self.transform_features(features, source_crs), output_file, self.output_format)
+
+    def convert_area_to_pixels(self, area_m2, pixel_area_m2=None):
         area_cm2 = area_m2 * 10000
-        pixel_area_cm2 = self.target_gsd * 100 * self.target_gsd * 100
+        if pixel_area_m2 is None:
+            pixel_area_cm2 = self.target_gsd * 100 * self.target_gsd * 100
+        else:
+            pixel_area_cm2 = pixel_area_m2 * 10000
         return int(area_cm2 / pixel_area_cm2)
 
-    def get_plant_metrics(self, height, pixel_count, vari_score):
-        age_ranges = self.reference_areas["tree"]
+    def get_plant_metrics(self, height, pixel_count, vari_score, pixel_area_m2=None, species="tree"):
+        age_ranges = self.reference_areas[species]
         estimated_age = None
         health_class = None
 
         for i in range(len(age_ranges)):
             current = age_ranges[i]
-            ref_pixels = self.convert_area_to_pixels(current["canopy_area"])
+            ref_pixels = self.convert_area_to_pixels(current["canopy_area"], pixel_area_m2)
             
             if i == 0 and height <= current["height"]:
                 estimated_age = f"0-{current['age']}"
@@ -153,7 +440,7 @@ class UtilsHealth:
                 if current["height"] <= height <= next_range["height"]:
                     estimated_age = f"{current['age']}-{next_range['age']}"
                     ref_height = next_range["height"]
-                    reference_pixels = self.convert_area_to_pixels(next_range["canopy_area"])
+                    reference_pixels = self.convert_area_to_pixels(next_range["canopy_area"], pixel_area_m2)
                     break
 
         if estimated_age:
@@ -174,79 +461,252 @@ class UtilsHealth:
 
         return estimated_age, health_class
     
+    def reference_breakpoints(self, species="tree", pixel_area_m2=None):
+        """
+        Reference heights, reference pixel areas and age-range labels of one table, computed once.
+        Labels are indexed by np.searchsorted(heights, h): "0-a0", "a0-a1", ..., "an+".
+        """
+        key = (species, pixel_area_m2)
+        if key not in self._breakpoints:
+            table = self.reference_areas[species]
+            ages = [row["age"] for row in table]
+            heights = np.array([row["height"] for row in table], dtype=float)
+            ref_pixels = np.array(
+                [self.convert_area_to_pixels(row["canopy_area"], pixel_area_m2) for row in table], dtype=float)
+            labels = ([f"0-{ages[0]}"] + [f"{ages[i]}-{ages[i + 1]}" for i in range(len(ages) - 1)]
+                      + [f"{ages[-1]}+"])
+            self._breakpoints[key] = (heights, ref_pixels, np.array(labels, dtype=object))
+        return self._breakpoints[key]
+
+    def classify_plot(self, heights, pixel_counts, vari_scores, species="tree", pixel_area_m2=None):
+        """
+        get_plant_metrics for all trees of a plot at once. `species` is one reference table key
+        or one key per tree. Returns the estimated_age and health class lists.
+        """
+        heights = np.asarray(heights, dtype=float)
+        pixel_counts = np.asarray(pixel_counts, dtype=float)
+        vari_scores = np.asarray(vari_scores, dtype=float)
+        species = np.broadcast_to(np.asarray(species, dtype=object), heights.shape)
+        ages = np.full(heights.shape, None, dtype=object)
+        classes = np.full(heights.shape, None, dtype=object)
+
+        for name in set(species.tolist()):
+            selected = np.flatnonzero(species == name)
+            ref_heights, ref_pixels, labels = self.reference_breakpoints(name, pixel_area_m2)
+            if np.any(np.diff(ref_heights) < 0):
+                # the range scan only behaves like a sorted search on ascending tables
+                for i in selected:
+                    ages[i], classes[i] = self.get_plant_metrics(
+                        heights[i], pixel_counts[i], vari_scores[i], pixel_area_m2, species=name)
+                continue
+
+            height = heights[selected]
+            position = np.searchsorted(ref_heights, height, side="left")
+            reference = np.minimum(position, len(ref_heights) - 1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                height_score = (height / ref_heights[reference]) * 100
+                area_score = (pixel_counts[selected] / ref_pixels[reference]) * 100
+                average_score = (height_score + area_score + vari_scores[selected] * 100) / 3
+            health_class = np.digitize(average_score, [25, 50, 75], right=True)
+
+            known = ~np.isnan(height)
+            ages[selected[known]] = labels[position[known]]
+            classes[selected[known]] = health_class[known].tolist()
+
+        return ages.tolist(), classes.tolist()
+
     def transform_coordinates(self, geometry, source_crs):
         """
         Transform coordinates from source CRS to WGS84
         """
-        # Create transformer from source CRS to WGS84
-        transformer = Transformer.from_crs(source_crs, self.wgs84, always_xy=True)
+        transformer = cached_transformer(source_crs, self.wgs84)
         
         if geometry['type'] == 'Polygon':
             new_coords = []
             for ring in geometry['coordinates']:
-                new_ring = []
-                for x, y in ring:
-                    lon, lat = transformer.transform(x, y)
-                    new_ring.append([lon, lat])
-                new_coords.append(new_ring)
+                ring = np.asarray(ring, dtype=float).reshape(-1, 2)
+                lon, lat = transformer.transform(ring[:, 0], ring[:, 1])
+                new_coords.append(np.column_stack([lon, lat]).tolist())
             geometry['coordinates'] = new_coords
         return geometry
 
-    def tree_health_calculator(self, image_path, dem_path, json_path, output_file):
-        total_area = 0
-        heights= []
-        with rasterio.open(image_path) as img_src:
-            transform = img_src.transform
-            scale_factor = transform.a / self.target_gsd 
-            source_crs = img_src.crs           
-            rgb_data, rgb_transform = self.resample_raster(img_src, scale_factor)
-            new_shape = rgb_data[0].shape
+    def transform_features(self, features, source_crs):
+        """
+        Transform the polygon rings of all features to WGS84 with a single transform call
+        """
+        rings = [
+            np.asarray(ring, dtype=float).reshape(-1, 2)
+            for feature in features if feature['geometry']['type'] == 'Polygon'
+            for ring in feature['geometry']['coordinates']
+        ]
+        lonlat = []
+        if rings:
+            vertices = np.concatenate(rings)
+            lon, lat = cached_transformer(source_crs, self.wgs84).transform(vertices[:, 0], vertices[:, 1])
+            lonlat = np.column_stack([lon, lat]).tolist()
 
-        with rasterio.open(dem_path) as dem_src:
-            dem_data, dem_transform = self.resample_raster(dem_src, scale_factor)
-            dem = dem_data[0]
+        transformed_features = []
+        start = 0
+        for feature in features:
+            transformed_feature = feature.copy()
+            geometry = dict(feature['geometry'])
+            if geometry['type'] == 'Polygon':
+                new_coords = []
+                for ring in geometry['coordinates']:
+                    new_coords.append(lonlat[start:start + len(ring)])
+                    start += len(ring)
+                geometry['coordinates'] = new_coords
+            transformed_feature['geometry'] = geometry
+            transformed_features.append(transformed_feature)
+        return transformed_features
 
+    def tree_health_calculator(self, image_path, dem_path, json_path, output_file=None, result=None):
+        """
+        Crown polygons with height, VARI and health class. The WGS84 features are written to
+        output_file when one is given and handed to result.health (a PlotResult) when one is given.
+        image_path may also be an open RasterHandle.
+        """
+        total_area = 0
+        heights= []
         point_label = self.json_loader(json_path)
-        vari_array = self.vari_calculator(rgb_data)
 
-        geojson_features = []
-        for obj in point_label:
-            scaled_points = [[int(p[0] * scale_factor), int(p[1] * scale_factor)] for p in obj["points"]]
-            
-            height_meters = self.height_calculator(
-                dem=dem,
-                dem_transform=dem_transform,
-                points=scaled_points,
-                img_transform=rgb_transform
-            )
-            if height_meters != None:
-                heights.append(height_meters)
+        # VARI is normalised over the whole image; windowed runs keep the raw tiles until the range is known
+        tiles = []
+        with open_raster(image_path) as img_src, rasterio.open(dem_path) as dem_file:
+            transform = img_src.transform
+            source_crs = img_src.crs
+            dem_src = self.aligned_dem(dem_file, source_crs) if self.native_dem else dem_file
+            if self.native_resolution:
+                # stay on the source grid; reference areas are converted with the true pixel area instead
+                scale_factor = 1.0
+                gsd_x, gsd_y = pixel_size_metres(transform, source_crs, (img_src.bounds.bottom + img_src.bounds.top) / 2)
+                pixel_area_m2 = gsd_x * gsd_y
+            else:
+                scale_factor = transform.a / self.target_gsd 
+                pixel_area_m2 = self.target_gsd * self.target_gsd
+            for rgb_data, dem, rgb_transform, dem_transform, offset, indices in self.read_tiles(
+                    img_src, dem_src, point_label, scale_factor):
+                tiles.append((self.raw_vari(rgb_data), dem, rgb_transform, dem_transform, offset, indices))
+            if self.windowed:
+                vari_min, vari_max = self.vari_range(img_src, scale_factor)
+            else:
+                vari_min = min(tile[0].min() for tile in tiles) if tiles else 0
+                vari_max = max(tile[0].max() for tile in tiles) if tiles else 0
+            if dem_src is not dem_file:
+                dem_src.close()
 
-            vari_score, pixel_count = self.zonal_sum_calculate(scaled_points, new_shape, vari_array)
-            estimated_age, health_class = self.get_plant_metrics(height_meters, pixel_count, vari_score)
+        geojson_features = [None] * len(point_label)
+        for vari_array, dem, rgb_transform, dem_transform, offset, indices in tiles:
+            vari_array = self.normalize_vari(vari_array, vari_min, vari_max)
+            if self.native_resolution:
+                tile_points = [
+                    np.asarray(point_label[idx]["points"], dtype=float).reshape(-1, 2) - offset
+                    for idx in indices
+                ]
+            else:
+                tile_points = [
+                    [[int(p[0] * scale_factor) - offset[0], int(p[1] * scale_factor) - offset[1]]
+                     for p in point_label[idx]["points"]]
+                    for idx in indices
+                ]
+            zonal = self.zonal_stats(tile_points, vari_array.shape, vari_array, exact=self.native_resolution)
+            tile_heights = [
+                self.height_calculator(
+                    dem=dem,
+                    dem_transform=dem_transform,
+                    points=points,
+                    img_transform=rgb_transform,
+                    exact=self.native_dem,
+                    offset=0.0 if self.native_resolution else 0.5
+                )
+                for points in tile_points
+            ]
+            heights.extend(tile_heights)
+            tile_ages, tile_classes = self.classify_plot(
+                tile_heights, zonal["pixel_count"], zonal["vari_mean"],
+                pixel_area_m2=None if not self.native_resolution else pixel_area_m2
+            )
+            for k, idx in enumerate(indices):
+                scaled_points = tile_points[k]
+                height_meters = tile_heights[k]
+                vari_score, pixel_count = zonal["vari_mean"][k], zonal["pixel_count"][k]
+                estimated_age, health_class = tile_ages[k], tile_classes[k]
             
-            geo_coordinates = [self.pixel_to_geo(point, rgb_transform) for point in scaled_points]
-            polygon = Polygon(geo_coordinates)
+                geo_coordinates = np.column_stack(self.pixels_to_geo(scaled_points, rgb_transform))
+                polygon = Polygon(geo_coordinates)
 
-            total_area += float(pixel_count * (self.target_gsd * self.target_gsd))
+                total_area += float(pixel_count * pixel_area_m2)
             
-            geojson_features.append({
-                "type": "Feature",
-                "geometry": mapping(polygon),
-                "properties": {
-                    "height_meters": float(height_meters) if not np.isnan(height_meters) else None,
-                    "vari_score": float(vari_score),
-                    "pixel_count": int(pixel_count),
-                    "estimated_age": estimated_age,
-                    "class": str(health_class) if health_class is not None else None, 
-                    "pixel_area_m2": float(pixel_count * (self.target_gsd * self.target_gsd)),
+                geojson_features[idx] = {
+                    "type": "Feature",
+                    "geometry": mapping(polygon),
+                    "properties": {
+                        "height_meters": float(height_meters) if not np.isnan(height_meters) else None,
+                        "vari_score": float(vari_score),
+                        "pixel_count": int(pixel_count),
+                        "estimated_age": estimated_age,
+                        "class": str(health_class) if health_class is not None else None, 
+                        "pixel_area_m2": float(pixel_count * pixel_area_m2),
+                    }
                 }
-            })
 
-        self.save_as_geojson(geojson_features, output_file, source_crs)
+        geojson_features = [feature for feature in geojson_features if feature is not None]
+        geojson_features = self.transform_features(geojson_features, source_crs)
+        if result is not None:
+            result.health = ParsedFeatures.from_features(geojson_features)
+        if output_file is not None:
+            write_features(geojson_features, output_file, self.output_format)
         less_than_1_5 = sum(1 for h in heights if h < 1.5)
         between_1_5_and_2_5 = sum(1 for h in heights if 1.5 <= h < 2.5)
         greater_than_2_5 = sum(1 for h in heights if h >= 2.5)
         
         return total_area, np.average(heights), less_than_1_5, between_1_5_and_2_5, greater_than_2_5
 
+def legacy_vari(rgb_data):
+    """The original VARI: float64 copies of every band and a temporary per operation"""
+    red_band = rgb_data[0].astype(float)
+    green_band = rgb_data[1].astype(float)
+    blue_band = rgb_data[2].astype(float)
+    vari = (green_band - red_band) / (green_band + red_band - blue_band + 1e-10)
+    return (vari - vari.min()) / (vari.max() - vari.min())
+
+
+def benchmark_vari_memory(height=6000, width=6000, seed=0):
+    """
+    tracemalloc peak (MB above the input) and time of VARI on a synthetic uint8 RGB raster:
+    the legacy float64 path against vari_calculator in float64 and float32
+    """
+    import time
+    import tracemalloc
+
+    rgb = np.random.default_rng(seed).integers(0, 256, size=(3, height, width), dtype=np.uint8)
+    health = UtilsHealth({})
+    runs = {
+        'legacy_float64': lambda: legacy_vari(rgb),
+        'vari_calculator_float64': lambda: health.vari_calculator(rgb, dtype=np.float64),
+        'vari_calculator_float32': lambda: health.vari_calculator(rgb, dtype=np.float32),
+    }
+    results = {}
+    reference = None
+    for name, run in runs.items():
+        tracemalloc.start()
+        start = time.perf_counter()
+        vari = run()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        if reference is None:
+            reference = vari
+        results[name] = {
+            'peak_mb': peak / 2 ** 20,
+            'result_mb': vari.nbytes / 2 ** 20,
+            'seconds': elapsed,
+            'max_abs_diff': float(np.max(np.abs(vari - reference))),
+        }
+        del vari
+    return results
+
+
+if __name__ == "__main__":
+    for name, stats in benchmark_vari_memory().items():
+        print(name, stats)
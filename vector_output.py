@@ -0,0 +1,118 @@
+import json
+import os
+import time
+import numpy as np
+from annotation_cache import load_feature_collection
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# output format -> file extension
+FORMATS = {'geojson': '.geojson', 'flatgeobuf': '.fgb', 'geoparquet': '.parquet'}
+
+WGS84_CRS = {
+    "type": "name",
+    "properties": {
+        "name": "urn:ogc:def:crs:EPSG::4326"
+    }
+}
+
+
+def dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj).decode()
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def write_geojson_stream(features, output_file):
+    """
+    Write compact GeoJSON one feature at a time, so neither the FeatureCollection
+    nor its serialised text is ever held in memory as a whole
+    """
+    count = 0
+    with open(output_file, 'w') as f:
+        f.write('{"type":"FeatureCollection","crs":' + dumps(WGS84_CRS) + ',"features":[')
+        for feature in features:
+            if count:
+                f.write(',')
+            f.write(dumps(feature))
+            count += 1
+        f.write(']}')
+    return count
+
+
+def write_features(features, output_file, output_format='geojson'):
+    """Write WGS84 features with the chosen backend and return how many were written"""
+    if output_format == 'geojson':
+        return write_geojson_stream(features, output_file)
+
+    import geopandas as gpd
+    gdf = gpd.GeoDataFrame.from_features(list(features), crs="EPSG:4326")
+    if output_format == 'flatgeobuf':
+        gdf.to_file(output_file, driver='FlatGeobuf')
+    elif output_format == 'geoparquet':
+        gdf.to_parquet(output_file)
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+    return len(gdf)
+
+
+def output_name(stem, output_format):
+    return stem + FORMATS[output_format]
+
+
+def benchmark_formats(features, folder, formats=tuple(FORMATS), repeat=3):
+    """Best-of-`repeat` write and read throughput (features per second) and file size per format"""
+    features = list(features)
+    results = {}
+    for output_format in formats:
+        path = os.path.join(folder, output_name('benchmark', output_format))
+        write_times, read_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            write_features(features, path, output_format)
+            write_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            load_feature_collection(path)
+            read_times.append(time.perf_counter() - start)
+
+        results[output_format] = {
+            'write_features_per_s': len(features) / min(write_times),
+            'read_features_per_s': len(features) / min(read_times),
+            'size_bytes': os.path.getsize(path),
+        }
+    return results
+
+
+def synthetic_features(n, seed=0):
+    """n small square crowns scattered over roughly 1 km around (0, 0), like a health output"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(-0.005, 0.005, size=(n, 2))
+    half = 0.000005
+    features = []
+    for x, y in centers.tolist():
+        ring = [[x - half, y - half], [x + half, y - half], [x + half, y + half], [x - half, y + half], [x - half, y - half]]
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": {
+                "height_meters": float(rng.uniform(0.5, 4)),
+                "vari_score": float(rng.uniform(0, 1)),
+                "pixel_count": int(rng.integers(100, 5000)),
+                "estimated_age": "0-5",
+                "class": str(rng.integers(0, 4)),
+                "pixel_area_m2": float(rng.uniform(0.1, 2)),
+            }
+        })
+    return features
+
+
+if __name__ == "__main__":
+    import tempfile
+    for n in (1000, 10000, 100000):
+        with tempfile.TemporaryDirectory() as folder:
+            for output_format, stats in benchmark_formats(synthetic_features(n), folder).items():
+                print(n, output_format, stats)
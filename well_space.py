@@ -1,105 +1,332 @@
-import json
-import math
-from collections import defaultdict
-from shapely.geometry import Polygon, Point
+import heapq
+import time
 import numpy as np
-from geopy.distance import geodesic
+from annotation_cache import as_features
+from plot_result import point_layer
+from vector_output import write_features
+from spatial_index import neighbor_pairs
+from distance import pair_distances
 
 class TreeGraph:
+    """
+    Trees are integer ids 0..n-1. Neighbours within the buffer distance are stored in CSR form:
+    row i is indices[indptr[i]:indptr[i + 1]] (ascending ids) with matching distances.
+    Removed / well-spaced state is passed around as boolean arrays over the ids.
+    """
     def __init__(self, well_space_dist):
-        self.nodes = {}
-        self.edges = defaultdict(list)
         self.well_space_dist = well_space_dist  # Distance in meters
+        self.coords = np.zeros((0, 2))  # (lon, lat) in WGS84
+        self.heights = np.zeros(0)  # NaN where the height is unknown
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.distances = np.zeros(0)
+
+    def build(self, coords, heights, first, second, distances):
+        """Fill the graph from undirected edge arrays (first[k], second[k], distances[k])"""
+        self.coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.heights = np.asarray(heights, dtype=float)
+        n = len(self.coords)
+        first = np.asarray(first, dtype=np.int64)
+        second = np.asarray(second, dtype=np.int64)
+        rows = np.concatenate([first, second])
+        cols = np.concatenate([second, first])
+        order = np.lexsort((cols, rows))
+        self.indices = cols[order].astype(np.int32)
+        self.distances = np.concatenate([distances, distances]).astype(float)[order]
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.indptr[1:])
+
+    def __len__(self):
+        return len(self.heights)
 
-    def add_node(self, tree_id, coords, height):
-        # coords should be (lon, lat) in WGS84
-        self.nodes[tree_id] = {
-            'coords': coords,
-            'height': height
-        }
+    def get_neighbors(self, node_id):
+        start, stop = self.indptr[node_id], self.indptr[node_id + 1]
+        return self.indices[start:stop], self.distances[start:stop]
 
-    def add_edge(self, id1, id2, distance):
-        self.edges[id1].append((id2, distance))
-        self.edges[id2].append((id1, distance))
+    def edge_rows(self):
+        """Row (source node) of every CSR entry"""
+        return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
 
-    def get_neighbors(self, node_id):
-        return self.edges[node_id]
+    def close_counts(self, removed):
+        """Per tree, the number of active neighbours closer than well_space_dist"""
+        close = (self.distances < self.well_space_dist) & ~removed[self.indices]
+        return np.bincount(self.edge_rows(), weights=close, minlength=len(self)).astype(np.int64)
+
+    def well_spaced_mask(self, removed):
+        return ~removed & (self.close_counts(removed) == 0)
 
-    def is_well_spaced(self, tree_id, removed_trees):
-        if tree_id in removed_trees:
+    def is_well_spaced(self, tree_id, removed):
+        if removed[tree_id]:
             return False
-        return all((neighbor in removed_trees or dist >= self.well_space_dist)
-                   for neighbor, dist in self.edges[tree_id])
+        neighbors, distances = self.get_neighbors(tree_id)
+        return bool(np.all(removed[neighbors] | (distances >= self.well_space_dist)))
 
-    def count_well_spaced(self, removed_trees):
-        return sum(1 for tree_id in self.nodes if self.is_well_spaced(tree_id, removed_trees))
+    def count_well_spaced(self, removed):
+        return int(np.count_nonzero(self.well_spaced_mask(removed)))
+
+    def edge_list(self):
+        """Undirected edges (first < second) with their distances, sorted by distance"""
+        rows = self.edge_rows()
+        upper = rows < self.indices
+        first, second, distances = rows[upper], self.indices[upper], self.distances[upper]
+        order = np.argsort(distances, kind='stable')
+        return first[order], second[order], distances[order]
 
 class TreeOptimizer:
-    def __init__(self, buffer_dist=3, well_space_dist=1):
+    def __init__(self, buffer_dist=3, well_space_dist=1, output_format='geojson', spatial_index=True,
+                 exact_distance=False, solver='greedy', objective='count',
+                 exact_max_component=40, exact_time_budget=1.0):
         # buffer_dist and well_space_dist should be in meters
         self.buffer_dist = buffer_dist
         self.well_space_dist = well_space_dist
+        self.output_format = output_format
+        self.spatial_index = spatial_index  # False measures every pair (reference path)
+        self.exact_distance = exact_distance  # batched Geod.inv instead of the local tangent plane
+        self.solver = solver  # 'greedy' (pairwise passes), 'heap' (lazy-heap greedy) or 'exact'
+        self.objective = objective  # 'count' of well-spaced trees or their total 'height' (heap / exact only)
+        self.exact_max_component = exact_max_component  # larger conflict components keep the heap solution
+        self.exact_time_budget = exact_time_budget  # seconds per plot for the exact solver
+        self.solver_report = None
+        self.neighbors = None  # NeighborIndex of the current plot, when one is shared
     
     def geographic_distance(self, coord1, coord2):
         """Calculate distance between two geographic coordinates in meters"""
         # coord1 and coord2 should be (lon, lat)
-        return geodesic((coord1[1], coord1[0]), (coord2[1], coord2[0])).meters
-
-    def load_and_build_graph(self):
-        with open(self.file_path, 'r') as f:
-            data = json.load(f)
+        return float(pair_distances([coord1, coord2], [0], [1], exact=self.exact_distance)[0])
 
-        features = data['features']
+    def load_and_build_graph(self, buffer_dist=None):
+        buffer_dist = self.buffer_dist if buffer_dist is None else buffer_dist
+        features = as_features(self.file_path)
         self.total_trees = len(features)
+        heights = features.values('height_meters', 0)
 
-        # Add nodes using centroids
-        for i, feature in enumerate(features):
-            tree_id = f"tree_{i}"
-            polygon_coords = feature['geometry']['coordinates'][0]
-            polygon = Polygon(polygon_coords)
-            centroid = polygon.centroid
-            coords = (centroid.x, centroid.y)  # (lon, lat)
-            height = feature['properties'].get('height_meters', 0)
-            self.graph.add_node(tree_id, coords, height)
+        if self.neighbors is not None:
+            # centroids, pairs and distances come from the plot's shared neighbour index
+            first, second, distances = self.neighbors.pairs_within(buffer_dist)
+            self.graph.build(self.neighbors.centroids, heights, first, second, distances)
+            return
 
+        centroids = features.centroids()  # (lon, lat)
         # Add edges between nodes if distance <= buffer_dist
-        for i, feature1 in enumerate(features):
-            for j in range(i + 1, len(features)):
-                tree_id1 = f"tree_{i}"
-                tree_id2 = f"tree_{j}"
-
-                coords1 = self.graph.nodes[tree_id1]['coords']
-                coords2 = self.graph.nodes[tree_id2]['coords']
+        if self.spatial_index:
+            # only pairs the grid index puts near each other are measured
+            first, second = neighbor_pairs(centroids, buffer_dist)
+        else:
+            first, second = np.triu_indices(self.total_trees, k=1)
 
-                distance = self.geographic_distance(coords1, coords2)
-                if distance <= self.buffer_dist:
-                    self.graph.add_edge(tree_id1, tree_id2, distance)
+        distances = pair_distances(centroids, first, second, exact=self.exact_distance)
+        keep = distances <= buffer_dist
+        self.graph.build(centroids, heights, first[keep], second[keep], distances[keep])
 
     def find_conflicting_pairs(self, removed_trees):
         conflicts = []
-        processed = set()
+        processed = np.zeros(len(self.graph), dtype=bool)
 
-        for tree_id in self.graph.nodes:
-            if tree_id in removed_trees or tree_id in processed:
+        for tree_id in range(len(self.graph)):
+            if removed_trees[tree_id] or processed[tree_id]:
                 continue
-            for neighbor_id, dist in self.graph.edges[tree_id]:
-                if neighbor_id not in removed_trees and neighbor_id not in processed and dist < self.well_space_dist:
-                    conflicts.append((tree_id, neighbor_id))
-                    processed.add(neighbor_id)
-            processed.add(tree_id)
+            neighbors, distances = self.graph.get_neighbors(tree_id)
+            conflicting = neighbors[~removed_trees[neighbors] & ~processed[neighbors]
+                                    & (distances < self.graph.well_space_dist)]
+            conflicts.extend((tree_id, neighbor_id) for neighbor_id in conflicting.tolist())
+            processed[conflicting] = True
+            processed[tree_id] = True
 
         return conflicts
 
     def evaluate_removal(self, tree_id, removed_trees):
         before_count = self.graph.count_well_spaced(removed_trees)
-        temp_removed = removed_trees | {tree_id}
+        temp_removed = removed_trees.copy()
+        temp_removed[tree_id] = True
         after_count = self.graph.count_well_spaced(temp_removed)
         return after_count - before_count
 
+    def close_neighbor_counts(self, removed_trees):
+        """Per tree, the number of active neighbours closer than the well-spacing distance"""
+        return self.graph.close_counts(removed_trees)
+
+    def removal_gain(self, tree_id, close_counts, removed_trees, weights=None):
+        """
+        Same value as evaluate_removal, in O(degree) from the close-neighbour counters.
+        With a weights array the gain is in weight instead of tree count.
+        """
+        if removed_trees[tree_id]:
+            return 0
+        neighbors, distances = self.graph.get_neighbors(tree_id)
+        # neighbours whose only close tree it is become well spaced; the tree itself stops counting if it was
+        freed = neighbors[~removed_trees[neighbors] & (distances < self.graph.well_space_dist)
+                          & (close_counts[neighbors] == 1)]
+        if weights is None:
+            return len(freed) - (1 if close_counts[tree_id] == 0 else 0)
+        return float(weights[freed].sum()) - (weights[tree_id] if close_counts[tree_id] == 0 else 0)
+
+    def remove_tree(self, tree_id, close_counts, removed_trees):
+        removed_trees[tree_id] = True
+        neighbors, distances = self.graph.get_neighbors(tree_id)
+        close_counts[neighbors[~removed_trees[neighbors] & (distances < self.graph.well_space_dist)]] -= 1
+
+    def tree_weights(self):
+        """Objective weight of every tree: 1 for 'count', the tree height for 'height'"""
+        if self.objective == 'count':
+            return np.ones(len(self.graph))
+        if self.objective == 'height':
+            return self.height_values()
+        raise ValueError(f"Unknown objective: {self.objective}")
+
+    def height_values(self):
+        return np.clip(np.nan_to_num(self.graph.heights, nan=0.0), 0.0, None)
+
     def optimize_spacing(self):
-        removed_trees = set()
+        weights = self.tree_weights()
+        optimal = False
+        if self.solver == 'greedy':
+            if self.objective != 'count':
+                # pairwise passes compare tree counts only; weighted objectives need 'heap' or 'exact'
+                raise ValueError(f"solver='greedy' only optimises objective='count', not {self.objective!r}")
+            removed_trees = self.pairwise_greedy()
+        elif self.solver == 'heap':
+            removed_trees = self.heap_greedy(weights)
+        elif self.solver == 'exact':
+            removed_trees, optimal = self.exact_spacing(weights)
+        else:
+            raise ValueError(f"Unknown solver: {self.solver}")
+
+        self.solver_report = {
+            'solver': self.solver,
+            'objective': self.objective,
+            'objective_value': float(weights[self.graph.well_spaced_mask(removed_trees)].sum()),
+            'optimal': optimal,
+        }
+        return removed_trees
+
+    def heap_greedy(self, weights):
+        """
+        Repeatedly remove the conflicted tree with the best gain (ties: the shorter tree, then
+        the lower id) until no two active trees are closer than the well-spacing distance.
+        Every tree whose gain changes gets a fresh heap entry; outdated entries are skipped on pop.
+        """
+        removed_trees = np.zeros(len(self.graph), dtype=bool)
+        close_counts = self.close_neighbor_counts(removed_trees)
+        heights = self.height_values()
+        heap = []
+
+        def push(tree_id):
+            if not removed_trees[tree_id] and close_counts[tree_id] > 0:
+                gain = self.removal_gain(tree_id, close_counts, removed_trees, weights)
+                heapq.heappush(heap, (-gain, heights[tree_id], tree_id))
+
+        for tree_id in range(len(self.graph)):
+            push(tree_id)
+
+        while heap:
+            negative_gain, _, tree_id = heapq.heappop(heap)
+            if removed_trees[tree_id] or close_counts[tree_id] == 0:
+                continue
+            if -negative_gain != self.removal_gain(tree_id, close_counts, removed_trees, weights):
+                continue
+
+            self.remove_tree(tree_id, close_counts, removed_trees)
+            # gains depend on the close counts of close neighbours, so refresh two hops out
+            affected = set()
+            for neighbor_id in self.close_neighbors(tree_id, removed_trees).tolist():
+                affected.add(neighbor_id)
+                affected.update(self.close_neighbors(neighbor_id, removed_trees).tolist())
+            for affected_id in affected:
+                push(affected_id)
+
+        return removed_trees
+
+    def close_neighbors(self, tree_id, removed_trees):
+        neighbors, distances = self.graph.get_neighbors(tree_id)
+        return neighbors[~removed_trees[neighbors] & (distances < self.graph.well_space_dist)]
+
+    def exact_spacing(self, weights):
+        """
+        Maximum-weight independent set of the close-neighbour graph, solved per connected component
+        by branch and bound. Components above exact_max_component, or left when the time budget runs
+        out, keep the heap_greedy solution. Returns the removed trees and whether all were proved optimal.
+        """
+        removed_trees = self.heap_greedy(weights)
+        deadline = time.perf_counter() + self.exact_time_budget
+        optimal = True
+
+        for component in self.conflict_components():
+            if len(component) > self.exact_max_component:
+                optimal = False
+                continue
+            kept = [tree_id for tree_id in component if not removed_trees[tree_id]]
+            chosen, proved = self.max_weight_independent_set(component, weights, kept, deadline)
+            optimal = optimal and proved
+            removed_trees[component] = True
+            removed_trees[list(chosen)] = False
+
+        return removed_trees, optimal
+
+    def conflict_components(self):
+        """Connected components of trees linked by edges shorter than the well-spacing distance"""
+        nobody_removed = np.zeros(len(self.graph), dtype=bool)
+        has_close = self.graph.close_counts(nobody_removed) > 0
+        seen = np.zeros(len(self.graph), dtype=bool)
+        components = []
+        for start in np.flatnonzero(has_close).tolist():
+            if seen[start]:
+                continue
+            seen[start] = True
+            component, stack = [], [start]
+            while stack:
+                tree_id = stack.pop()
+                component.append(tree_id)
+                for neighbor_id in self.close_neighbors(tree_id, nobody_removed).tolist():
+                    if not seen[neighbor_id]:
+                        seen[neighbor_id] = True
+                        stack.append(neighbor_id)
+            components.append(component)
+        return components
+
+    def max_weight_independent_set(self, component, weights, seed, deadline):
+        """Branch and bound over bitmasks, starting from the independent set `seed`"""
+        index = {tree_id: k for k, tree_id in enumerate(component)}
+        weight = [float(weights[tree_id]) for tree_id in component]
+        adjacency = [0] * len(component)
+        nobody_removed = np.zeros(len(self.graph), dtype=bool)
+        for tree_id in component:
+            for neighbor_id in self.close_neighbors(tree_id, nobody_removed).tolist():
+                if neighbor_id in index:
+                    adjacency[index[tree_id]] |= 1 << index[neighbor_id]
+
+        def bits(mask):
+            while mask:
+                low = mask & -mask
+                yield low.bit_length() - 1
+                mask ^= low
+
+        seed_mask = sum(1 << index[tree_id] for tree_id in seed)
+        best = {'value': sum(weight[k] for k in bits(seed_mask)), 'mask': seed_mask, 'timed_out': False}
+
+        def search(candidates, chosen, value):
+            if best['timed_out'] or time.perf_counter() > deadline:
+                best['timed_out'] = True
+                return
+            remaining = sum(weight[k] for k in bits(candidates))
+            if value + remaining <= best['value']:
+                return
+            vertex, degree = max(((k, bin(adjacency[k] & candidates).count('1')) for k in bits(candidates)),
+                                 key=lambda item: item[1], default=(None, 0))
+            if degree == 0:
+                best['value'], best['mask'] = value + remaining, chosen | candidates
+                return
+            bit = 1 << vertex
+            search(candidates & ~adjacency[vertex] & ~bit, chosen | bit, value + weight[vertex])
+            search(candidates & ~bit, chosen, value)
+
+        search((1 << len(component)) - 1, 0, 0)
+        return {component[k] for k in bits(best['mask'])}, not best['timed_out']
+
+    def pairwise_greedy(self):
+        removed_trees = np.zeros(len(self.graph), dtype=bool)
+        close_counts = self.close_neighbor_counts(removed_trees)
         iteration = 0
-        max_iterations = len(self.graph.nodes) * 2
+        max_iterations = len(self.graph) * 2
 
         while iteration < max_iterations:
             conflicts = self.find_conflicting_pairs(removed_trees)
@@ -108,21 +335,21 @@ class TreeOptimizer:
 
             improved = False
             for tree1, tree2 in conflicts:
-                if tree1 in removed_trees or tree2 in removed_trees:
+                if removed_trees[tree1] or removed_trees[tree2]:
                     continue
 
-                gain1 = self.evaluate_removal(tree1, removed_trees)
-                gain2 = self.evaluate_removal(tree2, removed_trees)
+                gain1 = self.removal_gain(tree1, close_counts, removed_trees)
+                gain2 = self.removal_gain(tree2, close_counts, removed_trees)
 
                 if gain1 > 0 or gain2 > 0:
                     if gain1 > gain2:
-                        removed_trees.add(tree1)
+                        self.remove_tree(tree1, close_counts, removed_trees)
                     elif gain2 > gain1:
-                        removed_trees.add(tree2)
+                        self.remove_tree(tree2, close_counts, removed_trees)
                     else:
-                        height1 = self.graph.nodes[tree1]['height']
-                        height2 = self.graph.nodes[tree2]['height']
-                        removed_trees.add(tree1 if height1 < height2 else tree2)
+                        height1 = self.graph.heights[tree1]
+                        height2 = self.graph.heights[tree2]
+                        self.remove_tree(tree1 if height1 < height2 else tree2, close_counts, removed_trees)
                     improved = True
 
             if not improved:
@@ -131,61 +358,113 @@ class TreeOptimizer:
 
         return removed_trees
 
-    def well_space_calculator(self, input_path, output_path):
+    def well_space_calculator(self, input_path, output_path=None, result=None, neighbors=None):
+        """
+        Well-spaced trees of a health layer, given as a file path or as in-memory ParsedFeatures.
+        The point layer is written to output_path and/or handed to result.wellspace (a PlotResult).
+        A NeighborIndex built from the same layer can be passed to skip neighbour discovery.
+        """
         self.graph = TreeGraph(self.well_space_dist)
         self.file_path = input_path
+        self.neighbors = neighbors
         self.total_trees = 0
         self.load_and_build_graph()
         removed_trees = self.optimize_spacing()
 
-        well_spaced_trees = [
-            tree_id for tree_id in self.graph.nodes
-            if tree_id not in removed_trees and self.graph.is_well_spaced(tree_id, removed_trees)
+        well_spaced_trees = self.graph.well_spaced_mask(removed_trees)
+        features = as_features(self.file_path)
+        properties = [
+            {
+                "class": '1' if well_spaced_trees[i] else '0',
+                "height_meters": feature_properties.get("height_meters", 0)
+            }
+            for i, feature_properties in enumerate(features.properties)
         ]
-        
-        new_features = []
-        with open(self.file_path, 'r') as f:
-            data = json.load(f)
-
-        # Add CRS information to ensure WGS84 is specified
-        new_geojson = {
-            "type": "FeatureCollection",
-            "crs": {
-                "type": "name",
-                "properties": {
-                    "name": "urn:ogc:def:crs:EPSG::4326"
-                }
-            },
-            "features": []
+        # [lon, lat] points in WGS84
+        points = point_layer(self.graph.coords, properties)
+        if result is not None:
+            result.wellspace = points
+        if output_path is not None:
+            write_features(points.to_features(), output_path, self.output_format)
+
+        heights = [p["height_meters"] for p in properties if p["class"] == '1']
+        return int(np.count_nonzero(well_spaced_trees)), np.average(heights) if heights else 0
+
+
+
+    def well_space_sweep(self, input_path, thresholds=(1.0, 1.5, 2.0, 2.5), neighbors=None):
+        """
+        Well-spaced count and average height for several well-spacing distances in one pass.
+        The neighbour graph is built once at the largest threshold. Raising the threshold only adds
+        edges from the distance-sorted edge list, and every solver decides each conflict component
+        on its own, so each threshold re-solves just the components its new edges touch and keeps
+        the previous solution everywhere else. Gives the same trees as separate runs (the exact
+        solver may differ where its time budget runs out). Returns one row per threshold, smallest first.
+        """
+        thresholds = sorted(thresholds)
+        self.file_path = input_path
+        self.neighbors = neighbors
+        self.graph = TreeGraph(thresholds[-1])
+        self.load_and_build_graph(max(self.buffer_dist, thresholds[-1]))
+        full_graph = self.graph
+        first, second, distances = full_graph.edge_list()
+        weights = self.tree_weights()
+
+        n = len(full_graph)
+        parent = list(range(n))
+
+        def root(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        removed_trees = np.zeros(n, dtype=bool)
+        proved = np.ones(n, dtype=bool)  # exact solver: component solved to optimality
+        start = 0
+        table = []
+        for threshold in thresholds:
+            stop = int(np.searchsorted(distances, threshold, side='left'))
+            for a, b in zip(first[start:stop].tolist(), second[start:stop].tolist()):
+                parent[root(a)] = root(b)
+            touched_roots = {root(a) for a in first[start:stop].tolist()}
+            start = stop
+
+            if touched_roots:
+                touched = np.array([root(i) in touched_roots for i in range(n)])
+                nodes = np.flatnonzero(touched)
+                relabel = np.full(n, -1, dtype=np.int64)
+                relabel[nodes] = np.arange(len(nodes))
+                # ascending relabelling keeps every id-based order and tie-break of the solvers
+                inside = touched[first[:stop]]
+                self.graph = TreeGraph(threshold)
+                self.graph.build(full_graph.coords[nodes], full_graph.heights[nodes],
+                                 relabel[first[:stop][inside]], relabel[second[:stop][inside]],
+                                 distances[:stop][inside])
+                removed_trees[nodes] = self.optimize_spacing()
+                proved[nodes] = self.solver_report['optimal']
+
+            # a tree is well spaced when it is kept and no kept tree is closer than the threshold
+            well_spaced_trees = ~removed_trees
+            conflict = ~removed_trees[first[:stop]] & ~removed_trees[second[:stop]]
+            well_spaced_trees[first[:stop][conflict]] = False
+            well_spaced_trees[second[:stop][conflict]] = False
+            heights = full_graph.heights[well_spaced_trees]
+            objective_value = float(weights[well_spaced_trees].sum())
+            table.append({
+                'threshold': threshold,
+                'count': int(np.count_nonzero(well_spaced_trees)),
+                'avg_height': float(np.average(heights)) if len(heights) else 0,
+                'objective_value': objective_value,
+            })
+        self.graph = full_graph
+        self.solver_report = {
+            'solver': self.solver,
+            'objective': self.objective,
+            'objective_value': objective_value,
+            'optimal': self.solver == 'exact' and bool(proved.all()),
         }
-
-        for i, feature in enumerate(data['features']):
-            tree_id = f"tree_{i}"
-            height = feature["properties"].get("height_meters", 0)
-
-            polygon = Polygon(feature['geometry']['coordinates'][0])
-            centroid = polygon.centroid
-            
-            new_feature = {
-                "type": "Feature",
-                "geometry": {
-                    "type": "Point",
-                    "coordinates": [centroid.x, centroid.y]  # [lon, lat]
-                },
-                "properties": {
-                    "class": '1' if tree_id in well_spaced_trees else '0',
-                    "height_meters": height
-                }
-            }
-            new_features.append(new_feature)
-
-        new_geojson["features"] = new_features
-
-        with open(output_path, 'w') as f:
-            json.dump(new_geojson, f)
-
-        heights = [f["properties"]["height_meters"] for f in new_features if f["properties"]["class"] == '1']
-        return len(well_spaced_trees), np.average(heights) if heights else 0
+        return table
 
 
 